@@ -5,50 +5,122 @@ import logging
 from homeassistant.components import bluetooth
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_ADDRESS, Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
 from homeassistant.exceptions import ConfigEntryNotReady
-
-from .const import DOMAIN
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
+
+from .capture import AdvertisementCapture, async_replay_capture, capture_path
+from .const import (
+    CONF_CAPTURE,
+    CONF_HISTORY_SIZE,
+    CONF_HUB_MODE,
+    CONF_IDLE_TIMEOUT,
+    CONF_KEEP_WARM,
+    CONF_MANUFACTURER_ID,
+    CONF_PAYLOAD_SCHEMA,
+    CONF_SCAN_MODE,
+    CONF_POLL_CHARACTERISTICS,
+    CONF_POLL_INTERVAL,
+    CONF_READ_CACHE,
+    DATA_CONNECTION_MANAGER,
+    DATA_POLL_SCHEDULER,
+    DEFAULT_CAPTURE,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_HUB_MODE,
+    DEFAULT_KEEP_WARM,
+    DEFAULT_PAYLOAD_SCHEMA,
+    DEFAULT_POLL_CHARACTERISTICS,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_READ_CACHE,
+    DEFAULT_SCAN_MODE,
+    DOMAIN,
+    SCAN_MODE_AUTO,
+    SCAN_MODE_PASSIVE,
+    Schema,
+)
 from .coordinator import GenericBTCoordinator
+from .hub import async_get_hub
+from .generic_bt_api.connection import ConnectionManager
+from .generic_bt_api.const import BEACON_MANUFACTURER_IDS, DEFAULT_IDLE_TIMEOUT
 from .generic_bt_api.device import GenericBTDevice
+from .generic_bt_api.uuids import parse_uuid_list
+from .generic_bt_api.poller import PollScheduler
+from .generic_bt_api.read_cache import parse_ttl_list
+from .generic_bt_api.schema import PayloadSchema
+from .storage import async_get_advertisement_cache
 
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = [Platform.BINARY_SENSOR, Platform.SENSOR]
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Register the integration services."""
+
+    async def _async_replay_capture(call: ServiceCall) -> ServiceResponse:
+        replayed = await async_replay_capture(hass, call.data["path"], call.data["speed"], call.data.get("address"))
+        return {"replayed": replayed}
+
+    hass.services.async_register(DOMAIN, "replay_capture", _async_replay_capture, Schema.REPLAY_CAPTURE.value, SupportsResponse.OPTIONAL)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Generic BT from a config entry."""
     assert entry.unique_id is not None
     hass.data.setdefault(DOMAIN, {})
-    address: str = entry.data[CONF_ADDRESS]
-    ble_device = bluetooth.async_ble_device_from_address(hass, address.upper(), True)
-    if not ble_device:
-        raise ConfigEntryNotReady(f"Could not find Generic BT Device with address {address}")
-    device = GenericBTDevice(ble_device)
-
-    # Get the service info to extract manufacturer data
-    service_info = await bluetooth.async_get_service_info_async(hass, ble_device.address)
-    if service_info and service_info.manufacturer_data:
-        # Extract the first manufacturer data item and convert its value to hex
-        manufacturer_id, manufacturer_data = list(service_info.manufacturer_data.items())[0]
-        # handle different manufacturers
-        if manufacturer_id == 1076:
-            device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data[6:]).hex()}
-        elif manufacturer_id == 65535:
-            # 0x25 = 37
-            if manufacturer_data[15] == 37:
-                device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex(), "mac_address": bytes(manufacturer_data[2:8]).hex(), "size": (manufacturer_data[18] << 8 | manufacturer_data[17]) / 100  }
-            else:
-                device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex(), "mac_address": bytes(manufacturer_data[2:8]).hex() }
-        else:
-            device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex()}
-
-    coordinator = hass.data[DOMAIN][entry.entry_id] = GenericBTCoordinator(hass, _LOGGER, ble_device, device, entry.title, entry.unique_id, True)
-    entry.async_on_unload(coordinator.async_start())
-
-    if not await coordinator.async_wait_ready():
-        raise ConfigEntryNotReady(f"{address} is not advertising state")
+    address: str = entry.data[CONF_ADDRESS].upper()
+    # connection slots are shared by all entries
+    device = GenericBTDevice(
+        None,
+        address,
+        hass.data.setdefault(DATA_CONNECTION_MANAGER, ConnectionManager()),
+        entry.options.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+        entry.options.get(CONF_KEEP_WARM, DEFAULT_KEEP_WARM),
+        parse_uuid_list(entry.options.get(CONF_POLL_CHARACTERISTICS, DEFAULT_POLL_CHARACTERISTICS)),
+        # compiled once here, every advertisement is decoded with it
+        PayloadSchema.from_text(entry.options.get(CONF_PAYLOAD_SCHEMA, DEFAULT_PAYLOAD_SCHEMA)),
+        entry.options.get(CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE),
+        parse_ttl_list(entry.options.get(CONF_READ_CACHE, DEFAULT_READ_CACHE)),
+    )
+    # entities start from the last known payload, live advertisements fill them in
+    advertisement_cache = async_get_advertisement_cache(hass)
+    await advertisement_cache.async_load()
+    if service_info := bluetooth.async_last_service_info(hass, address, False):
+        device.update_from_advertisement(service_info)
+    elif payload := advertisement_cache.async_get(address):
+        device.update_from_payload(*payload)
+    elif CONF_MANUFACTURER_ID not in entry.data:
+        # entries created before the manufacturer ID was stored, the scan mode and the platforms depend on it
+        raise ConfigEntryNotReady(f"Waiting for an advertisement of {address}")
+
+    manufacturer_id = device.manufacturer_id if device.manufacturer_id is not None else entry.data.get(CONF_MANUFACTURER_ID)
+    if manufacturer_id is not None and CONF_MANUFACTURER_ID not in entry.data:
+        # stored so the entry sets up right away the next time, even with an empty cache
+        hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_MANUFACTURER_ID: manufacturer_id})
+    # passive entries listen to any scanner and never get a client or a connection slot
+    connectable = not _is_passive(entry.options.get(CONF_SCAN_MODE, DEFAULT_SCAN_MODE), manufacturer_id)
+    ble_device = bluetooth.async_ble_device_from_address(hass, address, True) if connectable else None
+    device.set_ble_device(ble_device)
+
+    coordinator = hass.data[DOMAIN][entry.entry_id] = GenericBTCoordinator(
+        hass, _LOGGER, ble_device, device, entry.title, entry.unique_id, connectable, entry.options, manufacturer_id, advertisement_cache
+    )
+    if entry.options.get(CONF_CAPTURE, DEFAULT_CAPTURE):
+        capture = coordinator.capture = AdvertisementCapture(hass, capture_path(hass, address))
+        capture.async_start()
+        entry.async_on_unload(capture.async_stop)
+    if entry.options.get(CONF_HUB_MODE, DEFAULT_HUB_MODE):
+        entry.async_on_unload(async_get_hub(hass).async_add(coordinator, coordinator.manufacturer_id))
+    else:
+        entry.async_on_unload(coordinator.async_start())
+    if connectable and device.poll_characteristics and (poll_interval := entry.options.get(CONF_POLL_INTERVAL, DEFAULT_POLL_INTERVAL)):
+        # one scheduler for all entries spreads the polls over time and adapters
+        scheduler: PollScheduler = hass.data.setdefault(DATA_POLL_SCHEDULER, PollScheduler())
+        entry.async_on_unload(scheduler.add(address, coordinator.async_poll, poll_interval, lambda: device.adapter))
 
     entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -56,16 +128,31 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+def _is_passive(scan_mode: str, manufacturer_id: int | None) -> bool:
+    """Return if an entry only listens to advertisements."""
+    if scan_mode == SCAN_MODE_AUTO:
+        # beacons carry everything in their advertisements, there is nothing to connect to
+        return manufacturer_id in BEACON_MANUFACTURER_IDS
+    return scan_mode == SCAN_MODE_PASSIVE
+
+
 async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Handle options update."""
     await hass.config_entries.async_reload(entry.entry_id)
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Forget the cached payload of a removed entry."""
+    cache = async_get_advertisement_cache(hass)
+    await cache.async_load()
+    cache.async_remove(entry.data[CONF_ADDRESS].upper())
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator: GenericBTCoordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.device.stop()
         if not hass.config_entries.async_entries(DOMAIN):
             hass.data.pop(DOMAIN)
 
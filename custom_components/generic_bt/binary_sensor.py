@@ -1,17 +1,22 @@
 """Support for Generic BT binary sensor."""
 from __future__ import annotations
 
+from collections.abc import Mapping
 import logging
+from typing import Any
 
 from homeassistant.components.binary_sensor import BinarySensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, SupportsResponse
 from homeassistant.helpers import entity_platform
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, Schema
+from .const import DOMAIN, SIGNAL_NOTIFY_SUBSCRIBED, SIGNAL_NOTIFY_UNSUBSCRIBED, Schema
 from .coordinator import GenericBTCoordinator
 from .entity import GenericBTEntity
+from .generic_bt_api.const import MANUFACTURER_ID_1076, MANUFACTURER_ID_65535
+from .generic_bt_api.uuids import normalize_uuid
 
 
 # Initialize the logger
@@ -22,24 +27,22 @@ PARALLEL_UPDATES = 0
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
     """Set up Generic BT device based on a config entry."""
     coordinator: GenericBTCoordinator = hass.data[DOMAIN][entry.entry_id]
-    manufacturer_data = coordinator.device.manufacturer_data
-    # Ensure manufacturer_id is included in the data
-    if "manufacturer_id" not in manufacturer_data and manufacturer_data:
-        # Extract the manufacturer_id from the keys
-        manufacturer_id = list(manufacturer_data.keys())[0]
-        manufacturer_data["manufacturer_id"] = manufacturer_id
-
-    if manufacturer_data.get("manufacturer_id") != 65535 and manufacturer_data.get("manufacturer_id") != 1076:
+    # the binary sensor shows the connection and carries the GATT services, passive entries have neither
+    if coordinator.connectable and coordinator.manufacturer_id not in (MANUFACTURER_ID_65535, MANUFACTURER_ID_1076):
         async_add_entities([GenericBTBinarySensor(coordinator)])
         platform = entity_platform.async_get_current_platform()
         platform.async_register_entity_service("write_gatt", Schema.WRITE_GATT.value, "write_gatt")
-        platform.async_register_entity_service("read_gatt", Schema.READ_GATT.value, "read_gatt")
+        platform.async_register_entity_service("read_gatt", Schema.READ_GATT.value, "read_gatt", supports_response=SupportsResponse.OPTIONAL)
+        platform.async_register_entity_service("gatt_transaction", Schema.GATT_TRANSACTION.value, "gatt_transaction", supports_response=SupportsResponse.ONLY)
+        platform.async_register_entity_service("subscribe_notify", Schema.SUBSCRIBE_NOTIFY.value, "subscribe_notify")
+        platform.async_register_entity_service("unsubscribe_notify", Schema.UNSUBSCRIBE_NOTIFY.value, "unsubscribe_notify")
 
 
 class GenericBTBinarySensor(GenericBTEntity, BinarySensorEntity):
     """Representation of a Generic BT Binary Sensor."""
 
     _attr_name = None
+    _unrecorded_attributes = GenericBTEntity._unrecorded_attributes | {"polled_values", "cached_values"}
 
     def __init__(self, coordinator: GenericBTCoordinator) -> None:
         """Initialize the Device."""
@@ -49,10 +52,39 @@ class GenericBTBinarySensor(GenericBTEntity, BinarySensorEntity):
     def is_on(self):
         return self._device.connected
 
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        """Return the manufacturer data, the polled values and the cached reads."""
+        attributes = self._device.snapshot.attributes
+        if not self._device.poll_characteristics and not self._device.read_cache.ttls:
+            return attributes
+        attributes = dict(attributes)
+        if self._device.poll_characteristics:
+            attributes["polled_values"] = {uuid: value.hex() for uuid, value in self._device.polled_values.items()}
+        if self._device.read_cache.ttls:
+            attributes["cached_values"] = {uuid: value.hex() for uuid, value in self._device.read_cache.values().items()}
+        return attributes
+
     async def write_gatt(self, target_uuid, data):
         await self._device.write_gatt(target_uuid, data)
         self.async_write_ha_state()
 
     async def read_gatt(self, target_uuid):
-        await self._device.read_gatt(target_uuid)
+        data = await self._device.read_gatt(target_uuid)
+        self.async_write_ha_state()
+        return {"target_uuid": target_uuid, "data": data.hex()}
+
+    async def gatt_transaction(self, steps):
+        reads = await self._device.gatt_transaction((step["operation"], step["target_uuid"], step.get("data")) for step in steps)
+        self.async_write_ha_state()
+        return {"reads": [{"target_uuid": uuid, "data": data.hex()} for uuid, data in reads]}
+
+    async def subscribe_notify(self, target_uuid, format, offset, scale, buffer_size, max_rate):  # pylint: disable=redefined-builtin
+        subscription = await self._device.start_notify(target_uuid, format, offset, scale, buffer_size, max_rate)
+        async_dispatcher_send(self.hass, SIGNAL_NOTIFY_SUBSCRIBED.format(self._address), subscription)
+        self.async_write_ha_state()
+
+    async def unsubscribe_notify(self, target_uuid):
+        await self._device.stop_notify(target_uuid)
+        async_dispatcher_send(self.hass, SIGNAL_NOTIFY_UNSUBSCRIBED.format(self._address), normalize_uuid(target_uuid))
         self.async_write_ha_state()
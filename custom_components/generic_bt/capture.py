@@ -0,0 +1,135 @@
+"""Advertisement capture and replay."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+
+from homeassistant.components import bluetooth
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN
+from .generic_bt_api.capture import CapturedAdvertisement, CaptureWriter, read_capture
+
+if TYPE_CHECKING:
+    from .coordinator import GenericBTCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = timedelta(seconds=10)
+# flush early when this many bytes are buffered
+FLUSH_SIZE = 64 * 1024
+REPLAY_BATCH = 1000
+REPLAY_SOURCE = "replay"
+
+
+def capture_path(hass: HomeAssistant, address: str) -> str:
+    """Return the capture file of an address."""
+    return hass.config.path(f"{DOMAIN}_capture_{address.replace(':', '').lower()}.bin")
+
+
+class AdvertisementCapture:
+    """Buffer the raw advertisements of a coordinator and append them to its capture file off the event loop."""
+
+    def __init__(self, hass: HomeAssistant, path: str) -> None:
+        """Initialize the capture."""
+        self.hass = hass
+        self.writer = CaptureWriter(path)
+        self._writing: asyncio.Task | None = None
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Start flushing periodically."""
+        self._unsub_flush = async_track_time_interval(self.hass, self._async_flush, FLUSH_INTERVAL)
+
+    async def async_stop(self) -> None:
+        """Write what is left and stop."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        self._async_flush()
+        if self._writing is not None:
+            await self._writing
+
+    @callback
+    def async_record(self, service_info: bluetooth.BluetoothServiceInfoBleak) -> None:
+        """Buffer an advertisement, this only packs a few bytes."""
+        self.writer.append(service_info.time, service_info.address, service_info.rssi, service_info.manufacturer_data, service_info.service_data)
+        if self.writer.pending >= FLUSH_SIZE:
+            self._async_flush()
+
+    @callback
+    def _async_flush(self, _now=None) -> None:
+        if not self.writer.pending:
+            return
+        # writes are chained so the records land in the file in order
+        self._writing = self.hass.async_create_background_task(self._async_write(self._writing, self.writer.take()), f"{DOMAIN} capture {self.writer.path}")
+
+    async def _async_write(self, previous: asyncio.Task | None, data: bytes) -> None:
+        if previous is not None:
+            await previous
+        try:
+            await self.hass.async_add_executor_job(self.writer.write, data)
+        except OSError:
+            _LOGGER.exception("Writing the capture %s failed", self.writer.path)
+
+
+def _service_info(address: str, record: CapturedAdvertisement, timestamp: float) -> bluetooth.BluetoothServiceInfoBleak:
+    """Build the service info of a captured advertisement, it is not connectable so nothing connects to it."""
+    return bluetooth.BluetoothServiceInfoBleak(
+        name=address,
+        address=address,
+        rssi=record.rssi,
+        manufacturer_data=record.manufacturer_data,
+        service_data=record.service_data,
+        service_uuids=list(record.service_data),
+        source=REPLAY_SOURCE,
+        device=BLEDevice(address, None, None, record.rssi),
+        advertisement=AdvertisementData(None, record.manufacturer_data, record.service_data, list(record.service_data), None, record.rssi, ()),
+        connectable=False,
+        time=timestamp,
+    )
+
+
+async def async_replay_capture(hass: HomeAssistant, path: str, speed: float, address: str | None = None) -> int:
+    """Feed a capture to the coordinators of its addresses, or all of it to one address.
+
+    A speed of 1 replays in real time, 0 as fast as possible. Returns the number of replayed advertisements.
+    """
+    path = hass.config.path(path)
+    if not hass.config.is_allowed_path(path):
+        raise HomeAssistantError(f"Access to {path} is not allowed")
+    coordinators: dict[str, GenericBTCoordinator] = {coordinator.address: coordinator for coordinator in hass.data.get(DOMAIN, {}).values()}
+    replayed = 0
+    offset = 0
+    first: float | None = None
+    started = time.monotonic()
+    while True:
+        try:
+            records, offset = await hass.async_add_executor_job(read_capture, path, offset, REPLAY_BATCH)
+        except (OSError, ValueError) as exc:
+            raise HomeAssistantError(f"Reading the capture {path} failed: {exc}") from exc
+        if not records:
+            return replayed
+        for record in records:
+            target = address or record.address
+            if (coordinator := coordinators.get(target)) is None:
+                continue
+            if first is None:
+                first = record.timestamp
+            if speed and (delay := (record.timestamp - first) / speed - (time.monotonic() - started)) > 0:
+                await asyncio.sleep(delay)
+            # timestamps are moved to now so availability tracking sees a live device
+            service_info = _service_info(target, record, time.monotonic())
+            coordinator._async_handle_bluetooth_event(service_info, bluetooth.BluetoothChange.ADVERTISEMENT)  # pylint: disable=protected-access
+            replayed += 1
+        # let the event loop breathe between batches at full speed
+        await asyncio.sleep(0)
@@ -1,7 +1,10 @@
 """Config flow for GenericBT integration."""
 from __future__ import annotations
 
+from collections.abc import Iterable
+import fnmatch
 import logging
+import re
 from typing import Any
 
 from bluetooth_data_tools import human_readable_name
@@ -9,11 +12,49 @@ import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.components.bluetooth import BluetoothServiceInfoBleak, async_discovered_service_info
-from homeassistant.const import CONF_ADDRESS
+from homeassistant.const import CONF_ADDRESS, CONF_NAME
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.selector import TextSelector, TextSelectorConfig
 
-from .const import DOMAIN
-from .generic_bt_api.device import GenericBTDevice
+from .const import (
+    CONF_ADDRESSES,
+    CONF_CAPTURE,
+    CONF_DEADBAND,
+    CONF_HISTORY_SIZE,
+    CONF_HUB_MODE,
+    CONF_IDLE_TIMEOUT,
+    CONF_KEEP_WARM,
+    CONF_MANUFACTURER_ID,
+    CONF_METRIC_SENSORS,
+    CONF_MIN_INTERVAL,
+    CONF_NAME_PATTERN,
+    CONF_PAYLOAD_SCHEMA,
+    CONF_SCAN_MODE,
+    CONF_POLL_CHARACTERISTICS,
+    CONF_POLL_INTERVAL,
+    CONF_READ_CACHE,
+    DEFAULT_CAPTURE,
+    DEFAULT_DEADBAND,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_HUB_MODE,
+    DEFAULT_KEEP_WARM,
+    DEFAULT_METRIC_SENSORS,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_NAME_PATTERN,
+    DEFAULT_PAYLOAD_SCHEMA,
+    DEFAULT_POLL_CHARACTERISTICS,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_READ_CACHE,
+    DEFAULT_SCAN_MODE,
+    DOMAIN,
+    SCAN_MODES,
+)
+from .generic_bt_api.const import BEACON_MANUFACTURER_IDS, DEFAULT_IDLE_TIMEOUT
+from .generic_bt_api.uuids import parse_uuid_list
+from .generic_bt_api.read_cache import parse_ttl_list
+from .generic_bt_api.schema import parse_schema
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -25,7 +66,15 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self) -> None:
         """Initialize the config flow."""
         self._discovery_info: BluetoothServiceInfoBleak | None = None
-        self._discovered_devices: dict[str, BluetoothServiceInfoBleak] = {}
+        # discovered devices by manufacturer ID, built once per flow
+        self._index: dict[int | None, dict[str, BluetoothServiceInfoBleak]] = {}
+        self._matches: dict[str, BluetoothServiceInfoBleak] = {}
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
 
     async def async_step_bluetooth(self, discovery_info: BluetoothServiceInfoBleak) -> FlowResult:
         """Handle the bluetooth discovery step."""
@@ -36,69 +85,173 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self._abort_if_unique_id_configured()
         self._discovery_info = discovery_info
         self.context["title_placeholders"] = {"name": human_readable_name(None, discovery_info.name, discovery_info.address)}
-        return await self.async_step_user()
+        self._matches = {discovery_info.address: discovery_info}
+        return await self.async_step_select()
 
     async def async_step_user(self, user_input: dict[str, Any] | None = None) -> FlowResult:
-        """Handle the user step to pick discovered device."""
+        """Handle the user step to filter the discovered devices by manufacturer and name.
+
+        The devices of a bulk selection beyond the first come in here with their entry data,
+        they were confirmed in the select step of the flow that started them.
+        """
         errors: dict[str, str] = {}
 
-        if user_input is not None:
-            address = user_input[CONF_ADDRESS]
-            discovery_info = self._discovered_devices[address]
-            local_name = discovery_info.name
-            await self.async_set_unique_id(discovery_info.address, raise_on_progress=False)
+        if user_input is not None and CONF_ADDRESS in user_input:
+            data = dict(user_input)
+            await self.async_set_unique_id(data[CONF_ADDRESS], raise_on_progress=False)
             self._abort_if_unique_id_configured()
-            device = GenericBTDevice(discovery_info.device)
-            # Extract manufacturer data from the discovery info
-            if discovery_info.manufacturer_data:
-                # Extract the first manufacturer data item and convert its value to hex
-                manufacturer_id, manufacturer_data = list(discovery_info.manufacturer_data.items())[0]
-                # handle different manufacturers
-                if manufacturer_id == 1076:
-                    device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data[6:]).hex()}
-                elif manufacturer_id == 65535:
-                    # 0x25 = 37
-                    if manufacturer_data[15] == 37:
-                        device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex(), "mac_address": bytes(manufacturer_data[2:8]).hex(), "size": (manufacturer_data[18] << 8 | manufacturer_data[17]) / 100  }
-                    else:
-                        device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex(), "mac_address": bytes(manufacturer_data[2:8]).hex() }
-                else:
-                    device._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex()}
+            return self.async_create_entry(title=data.pop(CONF_NAME), data=data, options={CONF_HUB_MODE: data.pop(CONF_HUB_MODE)})
 
-            try:
-                await device.update()
-            except BLEAK_EXCEPTIONS:
-                errors["base"] = "cannot_connect"
-            except Exception:  # pylint: disable=broad-except
-                _LOGGER.exception("Unexpected error")
-                errors["base"] = "unknown"
-            else:
-                await device.stop()
-                return self.async_create_entry(title=local_name,data={CONF_ADDRESS: discovery_info.address})
-
-        if discovery := self._discovery_info:
-            self._discovered_devices[discovery.address] = discovery
+        if user_input is not None:
+            manufacturer = user_input.get(CONF_MANUFACTURER_ID, "")
+            pattern = re.compile(fnmatch.translate(user_input.get(CONF_NAME_PATTERN, DEFAULT_NAME_PATTERN)), re.IGNORECASE)
+            # only the devices of the picked manufacturer are matched against the pattern
+            candidates = self._index.values() if manufacturer == "" else [self._index[_manufacturer_from_option(manufacturer)]]
+            self._matches = {
+                address: service_info
+                for devices in candidates
+                for address, service_info in devices.items()
+                if pattern.match(service_info.name)
+            }
+            if self._matches:
+                return await self.async_step_select()
+            errors["base"] = "no_matching_devices"
         else:
-            current_addresses = self._async_current_ids()
-            for discovery in async_discovered_service_info(self.hass):
-                if (
-                    discovery.address in current_addresses
-                    or discovery.address in self._discovered_devices
-                ):
-                    continue
-                self._discovered_devices[discovery.address] = discovery
-
-        if not self._discovered_devices:
+            self._async_index_discovered_devices()
+
+        if not self._index:
             return self.async_abort(reason="no_devices_found")
 
+        manufacturers = {"": f"Any ({sum(len(devices) for devices in self._index.values())})"}
+        for manufacturer_id, devices in sorted(self._index.items(), key=lambda item: -len(item[1])):
+            label = "No manufacturer data" if manufacturer_id is None else str(manufacturer_id)
+            manufacturers[_manufacturer_option(manufacturer_id)] = f"{label} ({len(devices)})"
         data_schema = vol.Schema(
             {
-                vol.Required(CONF_ADDRESS): vol.In(
-                    {
-                        service_info.address: (f"{service_info.name} ({service_info.address})")
-                        for service_info in self._discovered_devices.values()
-                    }
-                ),
+                vol.Optional(CONF_MANUFACTURER_ID, default=""): vol.In(manufacturers),
+                vol.Optional(CONF_NAME_PATTERN, default=DEFAULT_NAME_PATTERN): str,
             }
         )
         return self.async_show_form(step_id="user", data_schema=data_schema, errors=errors)
+
+    async def async_step_select(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Handle the step to pick one or more of the matching devices."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            if addresses := user_input[CONF_ADDRESSES]:
+                # a flow creates one entry, the others get a user flow of their own that creates it right away,
+                # nothing is connected to, the manufacturer ID comes from the advertisement
+                hub_mode = user_input.get(CONF_HUB_MODE, DEFAULT_HUB_MODE)
+                first, *others = addresses
+                for address in others:
+                    service_info = self._matches[address]
+                    self.hass.async_create_task(
+                        self.hass.config_entries.flow.async_init(
+                            DOMAIN,
+                            context={"source": config_entries.SOURCE_USER},
+                            data={CONF_NAME: service_info.name, CONF_HUB_MODE: hub_mode, **_entry_data(service_info)},
+                        )
+                    )
+                service_info = self._matches[first]
+                await self.async_set_unique_id(service_info.address, raise_on_progress=False)
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(title=service_info.name, data=_entry_data(service_info), options={CONF_HUB_MODE: hub_mode})
+            errors["base"] = "no_devices_selected"
+
+        devices = {
+            address: f"{service_info.name} ({address})"
+            for address, service_info in sorted(self._matches.items(), key=lambda item: (item[1].name, item[0]))
+        }
+        data_schema = vol.Schema(
+            {
+                vol.Required(CONF_ADDRESSES, default=list(devices)): cv.multi_select(devices),
+                vol.Optional(CONF_HUB_MODE, default=_default_hub_mode(self._matches.values())): bool,
+            }
+        )
+        return self.async_show_form(step_id="select", data_schema=data_schema, errors=errors)
+
+    @callback
+    def _async_index_discovered_devices(self) -> None:
+        """Index the devices that are not configured yet by the manufacturer ID of their advertisement."""
+        current_addresses = self._async_current_ids()
+        # advertisement-only devices are only seen by passive scanners, include them
+        for service_info in async_discovered_service_info(self.hass, False):
+            if service_info.address in current_addresses:
+                continue
+            self._index.setdefault(_manufacturer_id(service_info), {})[service_info.address] = service_info
+
+
+def _manufacturer_id(service_info: BluetoothServiceInfoBleak) -> int | None:
+    """Return the ID of the first manufacturer data item, the one the device decodes."""
+    return next(iter(service_info.manufacturer_data), None)
+
+
+def _manufacturer_option(manufacturer_id: int | None) -> str:
+    return "none" if manufacturer_id is None else str(manufacturer_id)
+
+
+def _manufacturer_from_option(option: str) -> int | None:
+    return None if option == "none" else int(option)
+
+
+def _default_hub_mode(matches: Iterable[BluetoothServiceInfoBleak]) -> bool:
+    """Share the Bluetooth callbacks of a fleet, several devices or beacons that only advertise."""
+    matches = list(matches)
+    return len(matches) > 1 or all(_manufacturer_id(service_info) in BEACON_MANUFACTURER_IDS for service_info in matches)
+
+
+def _entry_data(service_info: BluetoothServiceInfoBleak) -> dict[str, Any]:
+    """Return the config entry data of a discovered device."""
+    data: dict[str, Any] = {CONF_ADDRESS: service_info.address}
+    if (manufacturer_id := _manufacturer_id(service_info)) is not None:
+        data[CONF_MANUFACTURER_ID] = manufacturer_id
+    return data
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle Generic BT options."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Manage the options."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            try:
+                parse_uuid_list(user_input.get(CONF_POLL_CHARACTERISTICS, DEFAULT_POLL_CHARACTERISTICS))
+            except ValueError:
+                errors[CONF_POLL_CHARACTERISTICS] = "invalid_uuid"
+            try:
+                parse_ttl_list(user_input.get(CONF_READ_CACHE, DEFAULT_READ_CACHE))
+            except ValueError:
+                errors[CONF_READ_CACHE] = "invalid_read_cache"
+            try:
+                parse_schema(user_input.get(CONF_PAYLOAD_SCHEMA, DEFAULT_PAYLOAD_SCHEMA))
+            except ValueError as exc:
+                _LOGGER.debug("Invalid payload schema: %s", exc)
+                errors[CONF_PAYLOAD_SCHEMA] = "invalid_schema"
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = user_input or self.config_entry.options
+        data_schema = vol.Schema(
+            {
+                vol.Optional(CONF_MIN_INTERVAL, default=options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_DEADBAND, default=options.get(CONF_DEADBAND, DEFAULT_DEADBAND)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_HUB_MODE, default=options.get(CONF_HUB_MODE, DEFAULT_HUB_MODE)): bool,
+                vol.Optional(CONF_SCAN_MODE, default=options.get(CONF_SCAN_MODE, DEFAULT_SCAN_MODE)): vol.In(SCAN_MODES),
+                vol.Optional(CONF_IDLE_TIMEOUT, default=options.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_KEEP_WARM, default=options.get(CONF_KEEP_WARM, DEFAULT_KEEP_WARM)): bool,
+                vol.Optional(CONF_POLL_CHARACTERISTICS, default=options.get(CONF_POLL_CHARACTERISTICS, DEFAULT_POLL_CHARACTERISTICS)): str,
+                vol.Optional(CONF_POLL_INTERVAL, default=options.get(CONF_POLL_INTERVAL, DEFAULT_POLL_INTERVAL)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_READ_CACHE, default=options.get(CONF_READ_CACHE, DEFAULT_READ_CACHE)): TextSelector(TextSelectorConfig(multiline=True)),
+                vol.Optional(CONF_PAYLOAD_SCHEMA, default=options.get(CONF_PAYLOAD_SCHEMA, DEFAULT_PAYLOAD_SCHEMA)): TextSelector(TextSelectorConfig(multiline=True)),
+                vol.Optional(CONF_METRIC_SENSORS, default=options.get(CONF_METRIC_SENSORS, DEFAULT_METRIC_SENSORS)): bool,
+                vol.Optional(CONF_CAPTURE, default=options.get(CONF_CAPTURE, DEFAULT_CAPTURE)): bool,
+                vol.Optional(CONF_HISTORY_SIZE, default=options.get(CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE)): vol.All(vol.Coerce(int), vol.Range(min=0, max=10000)),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=data_schema, errors=errors)
@@ -1,12 +1,82 @@
 """Constants"""
+import struct
 import voluptuous as vol
 from enum import Enum
 
 from homeassistant.helpers.config_validation import make_entity_service_schema
 import homeassistant.helpers.config_validation as cv
 
+from .generic_bt_api.const import OPERATION_READ, OPERATIONS
+
 DOMAIN = "generic_bt"
-DEVICE_STARTUP_TIMEOUT_SECONDS = 30
+DATA_HUB = f"{DOMAIN}_hub"
+DATA_ADVERTISEMENT_CACHE = f"{DOMAIN}_advertisement_cache"
+DATA_CONNECTION_MANAGER = f"{DOMAIN}_connection_manager"
+DATA_POLL_SCHEDULER = f"{DOMAIN}_poll_scheduler"
+# same as the bluetooth integration fallback for devices without a known advertising interval
+UNAVAILABLE_SECONDS = 195
+
+CONF_MIN_INTERVAL = "min_interval"
+CONF_DEADBAND = "deadband"
+DEFAULT_MIN_INTERVAL = 0.0
+DEFAULT_DEADBAND = 0.0
+CONF_HUB_MODE = "hub_mode"
+DEFAULT_HUB_MODE = False
+CONF_MANUFACTURER_ID = "manufacturer_id"
+# config flow filter and bulk selection, the pattern is a case insensitive glob on the name
+CONF_NAME_PATTERN = "name_pattern"
+DEFAULT_NAME_PATTERN = "*"
+CONF_ADDRESSES = "addresses"
+CONF_IDLE_TIMEOUT = "idle_timeout"
+CONF_KEEP_WARM = "keep_warm"
+DEFAULT_KEEP_WARM = False
+CONF_POLL_CHARACTERISTICS = "poll_characteristics"
+CONF_POLL_INTERVAL = "poll_interval"
+DEFAULT_POLL_CHARACTERISTICS = ""
+# 0 disables polling
+DEFAULT_POLL_INTERVAL = 0.0
+# comma or newline separated uuid=seconds, read_gatt is served from the cache for that long
+CONF_READ_CACHE = "read_cache"
+DEFAULT_READ_CACHE = ""
+# lines of "source, name, offset, type[, scale[, unit]]", see generic_bt_api.schema
+CONF_PAYLOAD_SCHEMA = "payload_schema"
+DEFAULT_PAYLOAD_SCHEMA = ""
+# advertisements kept for the rolling statistics, 0 disables the history
+CONF_HISTORY_SIZE = "history_size"
+DEFAULT_HISTORY_SIZE = 0
+# passive entries never connect, auto picks passive for the beacon manufacturers
+CONF_SCAN_MODE = "scan_mode"
+SCAN_MODE_AUTO = "auto"
+SCAN_MODE_ACTIVE = "active"
+SCAN_MODE_PASSIVE = "passive"
+SCAN_MODES = (SCAN_MODE_AUTO, SCAN_MODE_ACTIVE, SCAN_MODE_PASSIVE)
+DEFAULT_SCAN_MODE = SCAN_MODE_AUTO
+CONF_METRIC_SENSORS = "metric_sensors"
+DEFAULT_METRIC_SENSORS = False
+# append every raw advertisement to a capture file in the config directory
+CONF_CAPTURE = "capture"
+DEFAULT_CAPTURE = False
+
+# dispatcher signals, formatted with the device address
+SIGNAL_NOTIFY_SUBSCRIBED = f"{DOMAIN}_notify_subscribed_{{}}"
+SIGNAL_NOTIFY_UNSUBSCRIBED = f"{DOMAIN}_notify_unsubscribed_{{}}"
+
+def _struct_format(value: str) -> str:
+    """Validate a struct format that unpacks to a single number."""
+    value = cv.string(value)
+    try:
+        unpacked = struct.unpack(value, bytes(struct.calcsize(value)))
+    except struct.error as exc:
+        raise vol.Invalid(f"invalid struct format {value}") from exc
+    if len(unpacked) != 1 or not isinstance(unpacked[0], (int, float)):
+        raise vol.Invalid(f"struct format {value} must unpack to a single number")
+    return value
+
+def _has_data_for_writes(step: dict) -> dict:
+    """Require data for the write steps of a transaction."""
+    if step["operation"] != OPERATION_READ and "data" not in step:
+        raise vol.Invalid(f"data is required for {step['operation']} steps")
+    return step
 
 class Schema(Enum):
     """General used service schema definition"""
@@ -22,3 +92,45 @@ class Schema(Enum):
             vol.Required("target_uuid"): cv.string
         }
     )
+    GATT_TRANSACTION = make_entity_service_schema(
+        {
+            vol.Required("steps"): vol.All(
+                cv.ensure_list,
+                vol.Length(min=1),
+                [
+                    vol.All(
+                        vol.Schema(
+                            {
+                                vol.Required("operation"): vol.In(OPERATIONS),
+                                vol.Required("target_uuid"): cv.string,
+                                vol.Optional("data"): cv.string
+                            }
+                        ),
+                        _has_data_for_writes,
+                    )
+                ],
+            )
+        }
+    )
+    SUBSCRIBE_NOTIFY = make_entity_service_schema(
+        {
+            vol.Required("target_uuid"): cv.string,
+            vol.Optional("format", default="<h"): _struct_format,
+            vol.Optional("offset", default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional("scale", default=1.0): vol.Coerce(float),
+            vol.Optional("buffer_size", default=64): vol.All(vol.Coerce(int), vol.Range(min=1, max=4096)),
+            vol.Optional("max_rate", default=1.0): vol.All(vol.Coerce(float), vol.Range(min=0.01, max=50))
+        }
+    )
+    UNSUBSCRIBE_NOTIFY = make_entity_service_schema(
+        {
+            vol.Required("target_uuid"): cv.string
+        }
+    )
+    REPLAY_CAPTURE = vol.Schema(
+        {
+            vol.Required("path"): cv.string,
+            vol.Optional("speed", default=1.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional("address"): vol.All(cv.string, vol.Upper)
+        }
+    )
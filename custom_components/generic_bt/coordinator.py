@@ -1,51 +1,89 @@
 """Provides the DataUpdateCoordinator."""
 from __future__ import annotations
 
-import asyncio
-import contextlib
 import logging
+import time
+from collections.abc import Mapping
+from typing import Any
 
 from homeassistant.components import bluetooth
 from homeassistant.components.bluetooth.active_update_coordinator import ActiveBluetoothDataUpdateCoordinator
 from homeassistant.core import CoreState, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
 from bleak.backends.device import BLEDevice
 
+from .capture import REPLAY_SOURCE, AdvertisementCapture
 from .generic_bt_api.device import GenericBTDevice
-from .const import DOMAIN, DEVICE_STARTUP_TIMEOUT_SECONDS
+from .const import UNAVAILABLE_SECONDS
+from .storage import AdvertisementCache
 
 _LOGGER = logging.getLogger(__name__)
 
 class GenericBTCoordinator(ActiveBluetoothDataUpdateCoordinator[None]):
     """Class to manage fetching generic bt data."""
 
-    def __init__(self, hass: HomeAssistant, logger: logging.Logger, ble_device: BLEDevice, device: GenericBTDevice, device_name: str, base_unique_id: str, connectable: bool) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        logger: logging.Logger,
+        ble_device: BLEDevice | None,
+        device: GenericBTDevice,
+        device_name: str,
+        base_unique_id: str,
+        connectable: bool,
+        options: Mapping[str, Any] | None = None,
+        manufacturer_id: int | None = None,
+        advertisement_cache: AdvertisementCache | None = None,
+    ) -> None:
         """Initialize global generic bt data updater."""
-        super().__init__(hass=hass, logger=logger, address=ble_device.address, needs_poll_method=self._needs_poll, poll_method=self._async_update, mode=bluetooth.BluetoothScanningMode.ACTIVE, connectable=connectable)
+        super().__init__(hass=hass, logger=logger, address=device.address, needs_poll_method=self._needs_poll, poll_method=self._async_update, mode=bluetooth.BluetoothScanningMode.ACTIVE if connectable else bluetooth.BluetoothScanningMode.PASSIVE, connectable=connectable)
         self.ble_device = ble_device
         self.device = device
         self.device_name = device_name
         self.base_unique_id = base_unique_id
-        self._ready_event = asyncio.Event()
+        self.options = options or {}
+        self._manufacturer_id = manufacturer_id
+        self._advertisement_cache = advertisement_cache
         self._was_unavailable = True
+        self.capture: AdvertisementCapture | None = None
+        self._on_stop.append(device.register_connection_callback(self.async_update_listeners))
+        if not self._available and device.last_payload is not None:
+            # serve the restored state until the device has had time to advertise
+            self._available = True
+            self._on_stop.append(async_call_later(hass, UNAVAILABLE_SECONDS, self._async_restored_state_expired))
+
+    @property
+    def manufacturer_id(self) -> int | None:
+        """Return the manufacturer ID, from the last advertisement or the config entry."""
+        if (manufacturer_id := self.device.manufacturer_id) is not None:
+            return manufacturer_id
+        return self._manufacturer_id
+
+    @callback
+    def _async_restored_state_expired(self, _now) -> None:
+        """Mark the device unavailable if it did not advertise since startup."""
+        if self._was_unavailable:
+            self._available = False
+            self.async_update_listeners()
 
     @callback
     def _needs_poll(self, service_info: bluetooth.BluetoothServiceInfoBleak, seconds_since_last_poll: float | None) -> bool:
-        # Only poll if hass is running, we need to poll,
-        # and we actually have a way to connect to the device
+        # polls are driven by the shared scheduler so they are spread across devices,
+        # polling on advertisements would make devices advertising together poll together
         return False
-        return (
-            self.hass.state == CoreState.running
-            and self.device.poll_needed(seconds_since_last_poll)
-            and bool(
-                bluetooth.async_ble_device_from_address(
-                    self.hass, service_info.device.address, connectable=True
-                )
-            )
-        )
 
     async def _async_update(self, service_info: bluetooth.BluetoothServiceInfoBleak) -> None:
         """Poll the device."""
-        await self.device.update()
+        await self.async_poll()
+
+    async def async_poll(self) -> bool:
+        """Read the polled characteristics, return if a value changed."""
+        # Only poll if hass is running and we actually have a way to connect to the device
+        if self.hass.state != CoreState.running or not self.available or self.ble_device is None:
+            return False
+        if changed := await self.device.update():
+            self.async_update_listeners()
+        return changed
 
     @callback
     def _async_handle_unavailable(self, service_info: bluetooth.BluetoothServiceInfoBleak) -> None:
@@ -56,23 +94,35 @@ class GenericBTCoordinator(ActiveBluetoothDataUpdateCoordinator[None]):
     @callback
     def _async_handle_bluetooth_event(self, service_info: bluetooth.BluetoothServiceInfoBleak, change: bluetooth.BluetoothChange) -> None:
         """Handle a Bluetooth event."""
-        self.ble_device = service_info.device
-        _LOGGER.debug(f"{DOMAIN} - _async_handle_bluetooth_event - {service_info} - {self.ble_device}")
-        _LOGGER.debug(f"{DOMAIN} - _async_handle_bluetooth_event - {service_info.manufacturer_data} - {self.ble_device}")
-        self._ready_event.set()
+        # replayed advertisements are not captured again, replaying would never reach the end of the file
+        if self.capture is not None and service_info.source != REPLAY_SOURCE:
+            self.capture.async_record(service_info)
+        # passive entries also hear connectable devices, they still never connect to them
+        if self.connectable and service_info.connectable:
+            self.ble_device = service_info.device
+            self.device.set_ble_device(service_info.device, service_info.source)
+        # lazy arguments, nothing is formatted unless debug logging is on
+        _LOGGER.debug("%s: Advertisement %s through %s", self.address, service_info.manufacturer_data, service_info.source)
 
-        # if not self._was_unavailable:
-        #    return
+        metrics = self.device.metrics
+        metrics.received.increment()
+        # repeated payloads are dropped before decoding, unless the device is coming back,
+        # the history still counts them for the rate and RSSI statistics
+        started = time.perf_counter()
+        changed = self.device.update_from_advertisement(service_info.advertisement)
+        if changed:
+            metrics.decode_time.record(time.perf_counter() - started)
+            metrics.decoded.increment()
+        self.device.record_advertisement(service_info.time, service_info.rssi)
+        if not changed and not self._was_unavailable:
+            metrics.suppressed.increment()
+            return
 
+        if self._was_unavailable and self.connectable:
+            # the device is back, keep-warm devices connect before they are used
+            self.device.warm_up()
         self._was_unavailable = False
-        self.device.update_from_advertisement(service_info.advertisement)
-
+        metrics.forwarded.increment()
         super()._async_handle_bluetooth_event(service_info, change)
-
-    async def async_wait_ready(self) -> bool:
-        """Wait for the device to be ready."""
-        with contextlib.suppress(asyncio.TimeoutError):
-            async with asyncio.timeout(DEVICE_STARTUP_TIMEOUT_SECONDS):
-                await self._ready_event.wait()
-                return True
-        return False
+        if self._advertisement_cache is not None and (payload := self.device.last_payload) is not None:
+            self._advertisement_cache.async_set(self.address, payload)
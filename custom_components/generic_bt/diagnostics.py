@@ -0,0 +1,43 @@
+"""Diagnostics support for Generic BT."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_CONNECTION_MANAGER, DATA_HUB, DATA_POLL_SCHEDULER, DOMAIN
+from .coordinator import GenericBTCoordinator
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: GenericBTCoordinator = hass.data[DOMAIN][entry.entry_id]
+    device = coordinator.device
+    last_payload = device.last_payload
+    diagnostics: dict[str, Any] = {
+        "entry": {"title": entry.title, "data": dict(entry.data), "options": dict(entry.options)},
+        "device": {
+            "address": device.address,
+            "adapter": device.adapter,
+            "connected": device.connected,
+            "available": coordinator.available,
+            "manufacturer_id": coordinator.manufacturer_id,
+            "last_payload": last_payload[1].hex() if last_payload else None,
+            "manufacturer_data": {str(key): value for key, value in device.manufacturer_data.items()},
+            "field_values": device.field_values,
+            "polled_values": {uuid: value.hex() for uuid, value in device.polled_values.items()},
+            "subscriptions": {uuid: subscription.aggregates() for uuid, subscription in device.subscriptions.items()},
+        },
+        "metrics": device.metrics.as_dict(),
+        "operations": device.operations.as_dict(),
+        "read_cache": device.read_cache.as_dict(),
+        "history": device.history.as_dict() if device.history is not None else None,
+    }
+    if (connection_manager := hass.data.get(DATA_CONNECTION_MANAGER)) is not None:
+        diagnostics["connections"] = connection_manager.as_dict()
+    if (hub := hass.data.get(DATA_HUB)) is not None:
+        diagnostics["hub"] = hub.as_dict()
+    if (poll_scheduler := hass.data.get(DATA_POLL_SCHEDULER)) is not None:
+        diagnostics["polls"] = poll_scheduler.as_dict()
+    return diagnostics
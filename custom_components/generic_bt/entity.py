@@ -1,12 +1,17 @@
 """An abstract class common to all Generic BT entities."""
 from __future__ import annotations
 
+import asyncio
 import logging
+from typing import Any
 
 from homeassistant.components.bluetooth.passive_update_coordinator import PassiveBluetoothCoordinatorEntity
+from homeassistant.core import callback
 from homeassistant.helpers import device_registry as dr
 
+from .const import CONF_DEADBAND, CONF_MIN_INTERVAL, DEFAULT_DEADBAND, DEFAULT_MIN_INTERVAL
 from .coordinator import GenericBTCoordinator
+from .generic_bt_api.const import ATTR_RAW_PAYLOAD
 from .generic_bt_api.device import GenericBTDevice
 
 _LOGGER = logging.getLogger(__name__)
@@ -16,21 +21,71 @@ class GenericBTEntity(PassiveBluetoothCoordinatorEntity[GenericBTCoordinator]):
 
     _device: GenericBTDevice
     _attr_has_entity_name = True
+    # the raw payload changes with every advertisement, keep it out of the recorder
+    _unrecorded_attributes = frozenset({ATTR_RAW_PAYLOAD, "device_address", "mac_address"})
 
     def __init__(self, coordinator: GenericBTCoordinator) -> None:
         """Initialize the entity."""
         super().__init__(coordinator)
         self._device = coordinator.device
-        self._address = coordinator.ble_device.address
+        self._address = coordinator.address
         self._attr_unique_id = coordinator.base_unique_id
-        # Ensure manufacturer_data is properly formatted
-        manufacturer_data = self._device.manufacturer_data
-        if "manufacturer_id" not in manufacturer_data and manufacturer_data:
-            # Extract the manufacturer_id from the keys
-            manufacturer_id = list(manufacturer_data.keys())[0]
-            manufacturer_data["manufacturer_id"] = manufacturer_id
-        self._attr_extra_state_attributes = manufacturer_data
         self._attr_device_info = {
             "connections":{(dr.CONNECTION_BLUETOOTH, self._address)},
             "name":coordinator.device_name
         }
+        self._min_interval: float = coordinator.options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL)
+        self._deadband: float = coordinator.options.get(CONF_DEADBAND, DEFAULT_DEADBAND)
+        self._written_at = 0.0
+        self._written_value: Any = None
+        self._written_available: bool | None = None
+        self._pending_write: asyncio.TimerHandle | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Register callbacks."""
+        await super().async_added_to_hass()
+        self.async_on_remove(self._cancel_pending_write)
+
+    def _throttle_value(self) -> Any:
+        """Return the value the deadband applies to, None if there is none."""
+        return None
+
+    @callback
+    def _cancel_pending_write(self) -> None:
+        if self._pending_write:
+            self._pending_write.cancel()
+            self._pending_write = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state, unless it was written too recently or did not move past the deadband."""
+        available = self.available
+        if available == self._written_available:
+            if self._pending_write:
+                return
+            value = self._throttle_value()
+            if (
+                self._deadband
+                and isinstance(value, (int, float))
+                and isinstance(self._written_value, (int, float))
+                and abs(value - self._written_value) < self._deadband
+            ):
+                return
+            if (delay := self._written_at + self._min_interval - self.hass.loop.time()) > 0:
+                # write the latest state once the interval is over
+                self._pending_write = self.hass.loop.call_later(delay, self._async_write_pending)
+                return
+        self._async_write_throttled_state()
+
+    @callback
+    def _async_write_pending(self) -> None:
+        self._pending_write = None
+        self._async_write_throttled_state()
+
+    @callback
+    def _async_write_throttled_state(self) -> None:
+        self._cancel_pending_write()
+        self._written_at = self.hass.loop.time()
+        self._written_value = self._throttle_value()
+        self._written_available = self.available
+        self.async_write_ha_state()
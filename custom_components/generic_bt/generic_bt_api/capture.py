@@ -0,0 +1,130 @@
+"""compact binary advertisement capture"""
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping
+from functools import lru_cache
+import mmap
+import os
+import struct
+from uuid import UUID
+
+# file: magic and version, then records of a length prefix and a body
+MAGIC = b"GBTC\x02"
+_LENGTH = struct.Struct("<H")
+# monotonic timestamp, address, rssi, number of manufacturer data and of service data items
+_RECORD = struct.Struct("<d6sbBB")
+# manufacturer ID and payload length of a manufacturer data item
+_ITEM = struct.Struct("<HH")
+# service UUID and payload length of a service data item
+_SERVICE_ITEM = struct.Struct("<16sH")
+
+
+@lru_cache(maxsize=256)
+def _uuid_bytes(uuid: str) -> bytes:
+    return UUID(uuid).bytes
+
+
+class CapturedAdvertisement:
+    """An advertisement read back from a capture."""
+
+    __slots__ = ("timestamp", "address", "rssi", "manufacturer_data", "service_data")
+
+    def __init__(self, timestamp: float, address: str, rssi: int, manufacturer_data: dict[int, bytes], service_data: dict[str, bytes]) -> None:
+        self.timestamp = timestamp
+        self.address = address
+        self.rssi = rssi
+        self.manufacturer_data = manufacturer_data
+        self.service_data = service_data
+
+
+class CaptureWriter:
+    """Pack advertisements into an in-memory buffer, the owner appends it to the file off the event loop."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._buffer = bytearray()
+        self.records = 0
+
+    @property
+    def pending(self) -> int:
+        """Return the buffered bytes."""
+        return len(self._buffer)
+
+    def append(self, timestamp: float, address: str, rssi: int | None, manufacturer_data: Mapping[int, bytes], service_data: Mapping[str, bytes]) -> None:
+        """Buffer one advertisement."""
+        body = bytearray(
+            _RECORD.pack(timestamp, bytes.fromhex(address.replace(":", "")), max(-128, min(rssi or 0, 127)), len(manufacturer_data), len(service_data))
+        )
+        for manufacturer_id, payload in manufacturer_data.items():
+            body += _ITEM.pack(manufacturer_id, len(payload))
+            body += payload
+        for uuid, payload in service_data.items():
+            body += _SERVICE_ITEM.pack(_uuid_bytes(uuid), len(payload))
+            body += payload
+        self._buffer += _LENGTH.pack(len(body))
+        self._buffer += body
+        self.records += 1
+
+    def take(self) -> bytes:
+        """Return and clear the buffered records."""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def write(self, data: bytes) -> None:
+        """Append records to the file, writing the header to a new one. This is blocking I/O."""
+        with open(self.path, "ab") as file:
+            if file.tell() == 0:
+                file.write(MAGIC)
+            file.write(data)
+
+
+def read_capture(path: str, offset: int = 0, max_records: int | None = None) -> tuple[list[CapturedAdvertisement], int]:
+    """Read records through a memory map, from an offset returned by the previous call. This is blocking I/O.
+
+    Returns the records and the offset to continue from, a truncated last record is left for later.
+    """
+    records: list[CapturedAdvertisement] = []
+    if os.path.getsize(path) <= len(MAGIC):
+        return records, max(offset, len(MAGIC))
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            if view[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a capture")
+            position = max(offset, len(MAGIC))
+            end = len(view)
+            while position + _LENGTH.size <= end and (max_records is None or len(records) < max_records):
+                (length,) = _LENGTH.unpack_from(view, position)
+                if position + _LENGTH.size + length > end:
+                    break
+                body = position + _LENGTH.size
+                timestamp, address, rssi, items, service_items = _RECORD.unpack_from(view, body)
+                item = body + _RECORD.size
+                manufacturer_data: dict[int, bytes] = {}
+                for _ in range(items):
+                    manufacturer_id, size = _ITEM.unpack_from(view, item)
+                    item += _ITEM.size
+                    manufacturer_data[manufacturer_id] = bytes(view[item : item + size])
+                    item += size
+                service_data: dict[str, bytes] = {}
+                for _ in range(service_items):
+                    uuid, size = _SERVICE_ITEM.unpack_from(view, item)
+                    item += _SERVICE_ITEM.size
+                    service_data[str(UUID(bytes=uuid))] = bytes(view[item : item + size])
+                    item += size
+                records.append(CapturedAdvertisement(timestamp, ":".join(f"{byte:02X}" for byte in address), rssi, manufacturer_data, service_data))
+                position = body + length
+        finally:
+            view.release()
+    return records, position
+
+
+def iter_capture(path: str, batch: int = 1000) -> Iterator[CapturedAdvertisement]:
+    """Iterate over all records of a capture. This is blocking I/O."""
+    offset = 0
+    while True:
+        records, offset = read_capture(path, offset, batch)
+        if not records:
+            return
+        yield from records
@@ -0,0 +1,141 @@
+"""connection slots shared by all devices"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from .const import DEFAULT_MAX_CONNECTIONS_PER_ADAPTER, DEFAULT_SLOT_TIMEOUT
+from .exceptions import GenericBTTimeout
+
+if TYPE_CHECKING:
+    from .device import GenericBTDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TimingStats:
+    """Count, total, max and last duration of a timed step, in seconds."""
+
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        if duration > self.max:
+            self.max = duration
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class _AdapterSlots:
+    """Connection slots of one adapter, waiters are served first come first served."""
+
+    __slots__ = ("in_use", "holders", "waiters")
+
+    def __init__(self) -> None:
+        self.in_use = 0
+        self.holders: set[GenericBTDevice] = set()
+        self.waiters: deque[asyncio.Future[None]] = deque()
+
+
+class ConnectionManager:
+    """Cap the concurrent connections per adapter and evict idle ones when a slot is needed."""
+
+    def __init__(self, max_connections_per_adapter: int = DEFAULT_MAX_CONNECTIONS_PER_ADAPTER, slot_timeout: float = DEFAULT_SLOT_TIMEOUT) -> None:
+        self.max_connections_per_adapter = max_connections_per_adapter
+        self.slot_timeout = slot_timeout
+        self._adapters: dict[str | None, _AdapterSlots] = {}
+        self._held: dict[GenericBTDevice, str | None] = {}
+        self.connect_timing = TimingStats()
+        self.evict_timing = TimingStats()
+        self.queue_wait_timing = TimingStats()
+
+    async def async_acquire(self, device: GenericBTDevice) -> None:
+        """Wait for a connection slot on the adapter of the device."""
+        if device in self._held:
+            return
+        adapter = device.adapter
+        slots = self._adapters.setdefault(adapter, _AdapterSlots())
+        if slots.in_use < self.max_connections_per_adapter and not slots.waiters:
+            slots.in_use += 1
+        else:
+            started = time.monotonic()
+            waiter = asyncio.get_running_loop().create_future()
+            slots.waiters.append(waiter)
+            try:
+                if (victim := self._idle_victim(slots)) is not None:
+                    # the freed slot goes to the first waiter, which may be someone else
+                    _LOGGER.debug("%s: Evicting idle connection of %s", device.address, victim.address)
+                    await victim.async_disconnect()
+                    self.evict_timing.add(time.monotonic() - started)
+                async with asyncio.timeout(self.slot_timeout):
+                    await waiter
+            except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+                if waiter.done() and not waiter.cancelled():
+                    # the slot was handed over while we gave up, pass it on
+                    self._release_slot(slots)
+                else:
+                    waiter.cancel()
+                    slots.waiters.remove(waiter)
+                if isinstance(exc, asyncio.TimeoutError):
+                    raise GenericBTTimeout(f"No free connection slot for {device.address}") from exc
+                raise
+            self.queue_wait_timing.add(time.monotonic() - started)
+        slots.holders.add(device)
+        self._held[device] = adapter
+
+    def release(self, device: GenericBTDevice) -> None:
+        """Give the slot of a device back, it is handed to the first waiter."""
+        if (adapter := self._held.pop(device, ...)) is ...:
+            return
+        slots = self._adapters[adapter]
+        slots.holders.discard(device)
+        self._release_slot(slots)
+
+    def _release_slot(self, slots: _AdapterSlots) -> None:
+        while slots.waiters:
+            waiter = slots.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        slots.in_use -= 1
+
+    def has_waiters(self, device: GenericBTDevice) -> bool:
+        """Return if other devices wait for the slot held by a device."""
+        if (adapter := self._held.get(device, ...)) is ...:
+            return False
+        return bool(self._adapters[adapter].waiters)
+
+    def _idle_victim(self, slots: _AdapterSlots) -> GenericBTDevice | None:
+        """Return the least recently used idle connection that may be evicted."""
+        idle = [device for device in slots.holders if device.evictable]
+        return min(idle, key=lambda device: device.last_used) if idle else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the slot usage and timings."""
+        return {
+            "max_connections_per_adapter": self.max_connections_per_adapter,
+            "adapters": {
+                str(adapter): {"in_use": slots.in_use, "waiting": len(slots.waiters), "devices": [device.address for device in slots.holders]}
+                for adapter, slots in self._adapters.items()
+            },
+            "connect": self.connect_timing.as_dict(),
+            "evict": self.evict_timing.as_dict(),
+            "queue_wait": self.queue_wait_timing.as_dict(),
+        }
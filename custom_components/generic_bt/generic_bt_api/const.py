@@ -1,2 +1,42 @@
 """constants"""
 
+MANUFACTURER_ID_1076 = 1076
+MANUFACTURER_ID_65535 = 65535
+# manufacturers whose devices are beacons that are never connected to
+BEACON_MANUFACTURER_IDS = (MANUFACTURER_ID_1076, MANUFACTURER_ID_65535)
+# attribute holding the hex payload, the same for every manufacturer ID
+ATTR_RAW_PAYLOAD = "raw_payload"
+
+# manufacturer 65535 carries a size reading when byte 15 is 0x25
+SIZE_MARKER = 0x25
+SIZE_MARKER_OFFSET = 15
+SIZE_OFFSET = 17
+
+# connections
+DEFAULT_MAX_CONNECTIONS_PER_ADAPTER = 3
+DEFAULT_SLOT_TIMEOUT = 30.0
+DEFAULT_IDLE_TIMEOUT = 30.0
+# connection attempts, each with a short timeout and a growing pause between them,
+# waiting for a slot counts against both, all attempts together stop at the overall timeout
+CONNECT_ATTEMPT_TIMEOUT = 10.0
+CONNECT_TIMEOUT = 30.0
+CONNECT_ATTEMPTS = 3
+CONNECT_BACKOFF = 0.25
+CONNECT_BACKOFF_MAX = 4.0
+
+# gatt transaction steps
+OPERATION_READ = "read"
+OPERATION_WRITE = "write"
+OPERATION_WRITE_WITHOUT_RESPONSE = "write_without_response"
+OPERATIONS = (OPERATION_READ, OPERATION_WRITE, OPERATION_WRITE_WITHOUT_RESPONSE)
+
+# operation queue, lower priorities run first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+DEFAULT_MAX_PENDING_OPERATIONS = 32
+
+# polling, unchanged values stretch the interval up to MAX_FACTOR times the configured one
+POLL_BACKOFF_FACTOR = 1.5
+POLL_MAX_FACTOR = 8
+DEFAULT_POLL_JITTER = 0.1
+DEFAULT_POLL_SPACING = 2.0
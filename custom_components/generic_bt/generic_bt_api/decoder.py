@@ -0,0 +1,82 @@
+"""manufacturer data decoders"""
+from __future__ import annotations
+
+from collections.abc import Mapping
+import struct
+from typing import Any
+
+from .const import ATTR_RAW_PAYLOAD, MANUFACTURER_ID_1076, MANUFACTURER_ID_65535, SIZE_MARKER, SIZE_MARKER_OFFSET, SIZE_OFFSET
+from .snapshot import DeviceSnapshot
+
+
+class ManufacturerDecoder:
+    """Decode the payload of one manufacturer ID, the whole payload is exposed as hex in the raw payload attribute."""
+
+    __slots__ = ("manufacturer_id",)
+
+    def __init__(self, manufacturer_id: int) -> None:
+        self.manufacturer_id = manufacturer_id
+
+    def decode(self, payload: memoryview) -> dict[Any, Any]:
+        return {ATTR_RAW_PAYLOAD: payload.hex()}
+
+    def snapshot(self, payload: memoryview) -> DeviceSnapshot:
+        """Decode a payload into the snapshot the entities read, the state is the hex payload."""
+        data = self.decode(payload)
+        return DeviceSnapshot(self.manufacturer_id, data, data[ATTR_RAW_PAYLOAD])
+
+
+class Manufacturer1076Decoder(ManufacturerDecoder):
+    """Manufacturer 1076, the first 6 bytes are a header."""
+
+    __slots__ = ()
+
+    def decode(self, payload: memoryview) -> dict[Any, Any]:
+        return {ATTR_RAW_PAYLOAD: payload[6:].hex()}
+
+
+class Manufacturer65535Decoder(ManufacturerDecoder):
+    """Manufacturer 65535, carries the tag mac address and optionally a size reading."""
+
+    __slots__ = ()
+
+    _size = struct.Struct("<H")
+    _size_end = SIZE_OFFSET + _size.size
+
+    def decode(self, payload: memoryview) -> dict[Any, Any]:
+        data = {ATTR_RAW_PAYLOAD: payload.hex(), "mac_address": payload[2:8].hex()}
+        if len(payload) >= self._size_end and payload[SIZE_MARKER_OFFSET] == SIZE_MARKER:
+            data["size"] = self._size.unpack_from(payload, SIZE_OFFSET)[0] / 100
+        return data
+
+    def snapshot(self, payload: memoryview) -> DeviceSnapshot:
+        """The state is the size reading, the only attribute of the sensor."""
+        data = self.decode(payload)
+        size = data.get("size", 0.0)
+        return DeviceSnapshot(self.manufacturer_id, data, size, {"size": size})
+
+
+DECODERS: dict[int, ManufacturerDecoder] = {
+    MANUFACTURER_ID_1076: Manufacturer1076Decoder(MANUFACTURER_ID_1076),
+    MANUFACTURER_ID_65535: Manufacturer65535Decoder(MANUFACTURER_ID_65535),
+}
+
+
+def register_decoder(decoder: ManufacturerDecoder) -> None:
+    """Register the decoder used for its manufacturer ID."""
+    DECODERS[decoder.manufacturer_id] = decoder
+
+
+def get_decoder(manufacturer_id: int) -> ManufacturerDecoder:
+    """Return the decoder for a manufacturer ID, unknown IDs get a hex-only decoder."""
+    if (decoder := DECODERS.get(manufacturer_id)) is None:
+        decoder = DECODERS[manufacturer_id] = ManufacturerDecoder(manufacturer_id)
+    return decoder
+
+
+def decode_manufacturer_data(manufacturer_data: Mapping[int, bytes]) -> dict[Any, Any] | None:
+    """Decode the first manufacturer data item of an advertisement."""
+    if not manufacturer_data:
+        return None
+    manufacturer_id, payload = next(iter(manufacturer_data.items()))
+    return get_decoder(manufacturer_id).decode(memoryview(payload))
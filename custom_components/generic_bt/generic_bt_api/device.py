@@ -1,87 +1,443 @@
 """generic bt device"""
 
-from uuid import UUID
 import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+import contextlib
 import logging
-from contextlib import AsyncExitStack
+import time
+from typing import Any, TypeVar
 
-from bleak import BleakClient
+from bleak.backends.characteristic import BleakGATTCharacteristic
 from bleak.exc import BleakError
+from bleak_retry_connector import BleakClientWithServiceCache, establish_connection
+
+from .connection import ConnectionManager
+from .const import (
+    CONNECT_ATTEMPT_TIMEOUT,
+    CONNECT_ATTEMPTS,
+    CONNECT_BACKOFF,
+    CONNECT_BACKOFF_MAX,
+    CONNECT_TIMEOUT,
+    DEFAULT_IDLE_TIMEOUT,
+    OPERATION_READ,
+    OPERATION_WRITE,
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+)
+from .decoder import get_decoder
+from .exceptions import GenericBTBleakError, GenericBTCharacteristicNotFound, GenericBTNotConnectable, GenericBTTimeout
+from .history import AdvertisementHistory
+from .metrics import DeviceMetrics
+from .notify import NotifySubscription
+from .read_cache import ReadCache
+from .schema import PayloadSchema
+from .scheduler import OperationQueue
+from .snapshot import DeviceSnapshot
+from .uuids import normalize_uuid
 
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
 
-from typing import Any
 
 class GenericBTDevice:
     """Generic BT Device Class"""
-    def __init__(self, ble_device):
+    def __init__(
+        self,
+        ble_device,
+        address: str | None = None,
+        connection_manager: ConnectionManager | None = None,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        keep_warm: bool = False,
+        poll_characteristics: Iterable[str] = (),
+        payload_schema: PayloadSchema | None = None,
+        history_size: int = 0,
+        read_ttls: Mapping[str, float] | None = None,
+    ):
         self._ble_device = ble_device
-        self._client: BleakClient | None = None
-        self._client_stack = AsyncExitStack()
+        self.address = address or ble_device.address
+        # the scanner the device was last heard on, Home Assistant connects through the
+        # scanner of its choice, which is this one unless it is out of slots or failing
+        self.adapter: str | None = None
+        self._client: BleakClientWithServiceCache | None = None
+        self._connection_manager = connection_manager or ConnectionManager()
+        self._idle_timeout = idle_timeout
+        self.keep_warm = keep_warm
         self._lock = asyncio.Lock()
-        self._manufacturer_data: dict[int, str] = {}
-        # Initialize manufacturer_data with the device's address
-        self._manufacturer_data["device_address"] = ble_device.address
+        self.metrics = DeviceMetrics()
+        self.operations = OperationQueue(wait_time=self.metrics.queue_wait)
+        self._busy = 0
+        # a device that took a slot and has no client yet must keep the slot
+        self._connecting = False
+        self.last_used = 0.0
+        self._idle_handle: asyncio.TimerHandle | None = None
+        self._stopping = False
+        self._background_tasks: set[asyncio.Task] = set()
+        self._connection_callbacks: list[Callable[[], None]] = []
+        self.subscriptions: dict[str, NotifySubscription] = {}
+        self.poll_characteristics = tuple(normalize_uuid(uuid) for uuid in poll_characteristics)
+        self.polled_values: dict[str, bytes] = {}
+        self.read_cache = ReadCache(read_ttls)
+        self.payload_schema = payload_schema
+        self.field_values: dict[str, Any] = {}
+        self._service_payloads: dict[str, bytes] = {}
+        self.history = AdvertisementHistory(history_size) if history_size else None
+        self._last_payload: tuple[int, bytes] | None = None
+        # replaced, never changed, on every new payload, the address is all there is before the first one
+        self.snapshot = DeviceSnapshot(None, {"device_address": self.address}, None)
 
-    async def update(self):
-        pass
+    async def update(self) -> bool:
+        """Read the polled characteristics on one connection, return if a value changed."""
+        if not self.poll_characteristics:
+            return False
+        reads = await self.gatt_transaction(((OPERATION_READ, uuid, None) for uuid in self.poll_characteristics), PRIORITY_BACKGROUND)
+        changed = False
+        for uuid, value in reads:
+            if self.polled_values.get(uuid) != value:
+                self.polled_values[uuid] = bytes(value)
+                changed = True
+        return changed
 
     async def stop(self):
-            pass
+        """Disconnect and stop keeping the connection warm."""
+        self._stopping = True
+        await self.operations.async_stop()
+        await self.async_disconnect()
 
     @property
     def connected(self):
-        return not self._client is None
+        return self._client is not None and self._client.is_connected
+
+    @property
+    def evictable(self) -> bool:
+        """Return if the connection is idle and may be closed to free its slot."""
+        return not self._busy and not self._connecting and not self.keep_warm and not self.subscriptions
+
+    def set_ble_device(self, ble_device, adapter: str | None = None) -> None:
+        """Set the BLEDevice and the adapter it was seen on, used for the next connection."""
+        self._ble_device = ble_device
+        if adapter is not None:
+            self.adapter = adapter
+
+    def register_connection_callback(self, connection_callback: Callable[[], None]) -> Callable[[], None]:
+        """Register a callback for connection changes, return a callback removing it."""
+        self._connection_callbacks.append(connection_callback)
+        return lambda: self._connection_callbacks.remove(connection_callback)
+
+    def _fire_connection_callbacks(self) -> None:
+        for connection_callback in self._connection_callbacks:
+            connection_callback()
 
     async def get_client(self):
         async with self._lock:
-            if not self._client:
-                _LOGGER.debug("Connecting")
-                try:
-                    self._client = await self._client_stack.enter_async_context(BleakClient(self._ble_device, timeout=30))
-                except asyncio.TimeoutError as exc:
-                    _LOGGER.debug("Timeout on connect", exc_info=True)
-                    raise IdealLedTimeout("Timeout on connect") from exc
-                except BleakError as exc:
-                    _LOGGER.debug("Error on connect", exc_info=True)
-                    raise IdealLedBleakError("Error on connect") from exc
-            else:
+            if self.connected:
                 _LOGGER.debug("Connection reused")
+                return
+            self._stopping = False
+            self._connecting = True
+            try:
+                self._client = await self._async_connect()
+                self.last_used = time.monotonic()
+                await self._async_resubscribe()
+            finally:
+                self._connecting = False
+            self._schedule_idle_disconnect()
+        self._fire_connection_callbacks()
 
-    async def write_gatt(self, target_uuid, data):
+    async def _async_connect(self) -> BleakClientWithServiceCache:
+        """Connect, retrying with a growing pause.
+
+        Every attempt, waiting for a slot included, is cut off after CONNECT_ATTEMPT_TIMEOUT
+        and no attempt starts or runs past CONNECT_TIMEOUT. Within Home Assistant the client
+        picks the scanner or proxy itself, by signal, free slots and past failures, the slot
+        is taken on the adapter the device was last heard on.
+        """
+        if self._ble_device is None:
+            raise GenericBTNotConnectable(f"No connectable path to {self.address}")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CONNECT_TIMEOUT
+        error: Exception | None = None
+        for attempt in range(CONNECT_ATTEMPTS):
+            pause = min(CONNECT_BACKOFF * 2 ** (attempt - 1), CONNECT_BACKOFF_MAX) if attempt else 0.0
+            if (remaining := deadline - loop.time() - pause) <= 0:
+                # the pause alone would use up what is left
+                break
+            if pause:
+                await asyncio.sleep(pause)
+            try:
+                async with asyncio.timeout(min(CONNECT_ATTEMPT_TIMEOUT, remaining)):
+                    await self._connection_manager.async_acquire(self)
+                    _LOGGER.debug("%s: Connecting, last heard on %s", self.address, self.adapter)
+                    started = time.monotonic()
+                    client = await establish_connection(
+                        BleakClientWithServiceCache,
+                        self._ble_device,
+                        self.address,
+                        self._async_disconnected,
+                        max_attempts=1,
+                        use_services_cache=True,
+                        timeout=CONNECT_ATTEMPT_TIMEOUT,
+                    )
+            except (asyncio.TimeoutError, BleakError, GenericBTTimeout) as exc:
+                self._connection_manager.release(self)
+                self.metrics.connect_failed(exc)
+                _LOGGER.debug("%s: Connecting failed", self.address, exc_info=True)
+                error = exc
+                continue
+            except BaseException:
+                self._connection_manager.release(self)
+                raise
+            self._connection_manager.connect_timing.add(duration := time.monotonic() - started)
+            self.metrics.connect_time.record(duration)
+            return client
+        if isinstance(error, (asyncio.TimeoutError, GenericBTTimeout)):
+            raise GenericBTTimeout("Timeout on connect") from error
+        raise GenericBTBleakError("Error on connect") from error
+
+    @contextlib.asynccontextmanager
+    async def _client_session(self) -> AsyncIterator[BleakClientWithServiceCache]:
+        """Connect if needed and keep the connection from going idle while it is used."""
         await self.get_client()
-        uuid_str = "{" + target_uuid + "}"
-        uuid = UUID(uuid_str)
+        self._cancel_idle_disconnect()
+        self._busy += 1
+        try:
+            yield self._client
+        finally:
+            self._busy -= 1
+            self.last_used = time.monotonic()
+            self._schedule_idle_disconnect()
+
+    def _cancel_idle_disconnect(self) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def _schedule_idle_disconnect(self) -> None:
+        if self._busy or self.keep_warm or self.subscriptions or not self.connected:
+            return
+        self._cancel_idle_disconnect()
+        # hand the slot over right away when other devices wait for it
+        delay = 0 if self._connection_manager.has_waiters(self) else self._idle_timeout
+        self._idle_handle = asyncio.get_running_loop().call_later(delay, self._idle_disconnect)
+
+    def _create_background_task(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _idle_disconnect(self) -> None:
+        self._idle_handle = None
+        if not self._busy:
+            _LOGGER.debug("%s: Disconnecting idle connection", self.address)
+            self._create_background_task(self.async_disconnect())
+
+    async def async_disconnect(self) -> None:
+        """Disconnect and give the connection slot back."""
+        self._cancel_idle_disconnect()
+        client, self._client = self._client, None
+        if client is not None:
+            with contextlib.suppress(BleakError):
+                await client.disconnect()
+        self._connection_manager.release(self)
+        if client is not None:
+            self._fire_connection_callbacks()
+
+    def _async_disconnected(self, client: BleakClientWithServiceCache) -> None:
+        if client is not self._client:
+            return
+        _LOGGER.debug("%s: Disconnected", self.address)
+        self._client = None
+        self._cancel_idle_disconnect()
+        self._connection_manager.release(self)
+        self._fire_connection_callbacks()
+        if (self.keep_warm or self.subscriptions) and not self._stopping:
+            self._create_background_task(self._async_reconnect())
+
+    def warm_up(self) -> None:
+        """Connect a keep-warm device ahead of its first operation."""
+        if self.keep_warm and not self._stopping and not self.connected and not self._connecting and self._ble_device is not None:
+            self._create_background_task(self._async_reconnect())
+
+    async def _async_reconnect(self) -> None:
+        """Connect a keep-warm or subscribed device in the background, after an unexpected disconnect or to warm it up."""
+        try:
+            await self.get_client()
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.debug("%s: Reconnect failed", self.address, exc_info=True)
+
+    async def _async_resubscribe(self) -> None:
+        """Subscribe again to the notifications that were active before the connection dropped."""
+        for subscription in self.subscriptions.values():
+            try:
+                await self._async_start_notify(self._client, subscription)
+            except (BleakError, GenericBTCharacteristicNotFound):
+                _LOGGER.debug("%s: Resubscribing to %s failed", self.address, subscription.uuid, exc_info=True)
+
+    def _resolve_characteristic(self, client: BleakClientWithServiceCache, uuid: str) -> BleakGATTCharacteristic:
+        """Return the characteristic of a UUID from the service table of the connection."""
+        if (characteristic := client.services.get_characteristic(uuid)) is None:
+            raise GenericBTCharacteristicNotFound(f"Characteristic {uuid} not found on {self.address}")
+        return characteristic
+
+    async def _async_run(self, run: Callable[[BleakClientWithServiceCache], Awaitable[_T]]) -> _T:
+        """Run an operation on the connection, once more on a new connection if a characteristic is missing.
+
+        Connections start from the service table cached by the stack, a missing
+        characteristic may only mean that table is out of date.
+        """
+        async with self._client_session() as client:
+            try:
+                return await run(client)
+            except GenericBTCharacteristicNotFound:
+                _LOGGER.debug("%s: Characteristic not found, discovering the services again", self.address, exc_info=True)
+                with contextlib.suppress(BleakError):
+                    await client.clear_cache()
+                await self.async_disconnect()
+                await self.get_client()
+                return await run(self._client)
+
+    async def _async_write(self, client: BleakClientWithServiceCache, uuid: str, data: bytes, response: bool) -> None:
+        started = time.monotonic()
+        # the cached value is stale even if the write failed half way
+        self.read_cache.invalidate(uuid)
+        await client.write_gatt_char(self._resolve_characteristic(client, uuid), data, response)
+        self.metrics.write_time.record(time.monotonic() - started)
+
+    async def _async_read(self, client: BleakClientWithServiceCache, uuid: str) -> bytearray:
+        started = time.monotonic()
+        value = await client.read_gatt_char(self._resolve_characteristic(client, uuid))
+        self.metrics.read_time.record(time.monotonic() - started)
+        # transactions and polls keep the cache fresh as well
+        self.read_cache.set(uuid, value)
+        return value
+
+    async def _async_start_notify(self, client: BleakClientWithServiceCache, subscription: NotifySubscription) -> None:
+        await client.start_notify(self._resolve_characteristic(client, subscription.uuid), subscription.handle_notification)
+
+    async def start_notify(
+        self,
+        target_uuid: str,
+        value_format: str,
+        offset: int = 0,
+        scale: float = 1.0,
+        buffer_size: int = 64,
+        max_rate: float = 1.0,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> NotifySubscription:
+        """Subscribe to the notifications of a characteristic, the connection is kept open while subscribed."""
+        uuid = normalize_uuid(target_uuid)
+        subscription = NotifySubscription(uuid, value_format, offset, scale, buffer_size, max_rate)
+
+        async def _start(client: BleakClientWithServiceCache) -> None:
+            if uuid in self.subscriptions:
+                with contextlib.suppress(BleakError, GenericBTCharacteristicNotFound):
+                    await client.stop_notify(self._resolve_characteristic(client, uuid))
+                del self.subscriptions[uuid]
+            await self._async_start_notify(client, subscription)
+            self.subscriptions[uuid] = subscription
+
+        await self.operations.async_submit(lambda: self._async_run(_start), priority)
+        return subscription
+
+    async def stop_notify(self, target_uuid: str, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Unsubscribe from the notifications of a characteristic."""
+        uuid = normalize_uuid(target_uuid)
+        if self.subscriptions.pop(uuid, None) is None:
+            return
+
+        async def _stop() -> None:
+            if self.connected:
+                with contextlib.suppress(BleakError, GenericBTCharacteristicNotFound):
+                    await self._client.stop_notify(self._resolve_characteristic(self._client, uuid))
+            self.last_used = time.monotonic()
+            self._schedule_idle_disconnect()
+
+        await self.operations.async_submit(_stop, priority)
+
+    async def write_gatt(self, target_uuid, data, priority: int = PRIORITY_INTERACTIVE):
+        uuid = normalize_uuid(target_uuid)
         data_as_bytes = bytearray.fromhex(data)
-        await self._client.write_gatt_char(uuid, data_as_bytes, True)
 
-    async def read_gatt(self, target_uuid):
-        await self.get_client()
-        uuid_str = "{" + target_uuid + "}"
-        uuid = UUID(uuid_str)
-        data = await self._client.read_gatt_char(uuid)
-        print(data)
-        return data
-
-    def update_from_advertisement(self, advertisement: Any) -> None:
-        """Update the device from a Bluetooth advertisement."""
-        if advertisement.manufacturer_data:
-            # Extract the first manufacturer data item and convert its value to hex
-            manufacturer_id, manufacturer_data = list(advertisement.manufacturer_data.items())[0]
-            # handle different manufacturers
-            if manufacturer_id == 1076:
-                self._manufacturer_data = {manufacturer_id: bytes(manufacturer_data[6:]).hex()}
-            elif manufacturer_id == 65535:
-                # 0x25 = 37
-                if manufacturer_data[15] == 37:
-                    self._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex(), "mac_address": bytes(manufacturer_data[2:8]).hex(), "size": (manufacturer_data[18] << 8 | manufacturer_data[17]) / 100  }
+        async def _write() -> None:
+            await self._async_run(lambda client: self._async_write(client, uuid, data_as_bytes, True))
+
+        # a newer value for the same characteristic replaces a queued one
+        await self.operations.async_submit(_write, priority, (OPERATION_WRITE, uuid))
+
+    async def read_gatt(self, target_uuid, priority: int = PRIORITY_INTERACTIVE):
+        uuid = normalize_uuid(target_uuid)
+
+        async def _read() -> bytearray:
+            return await self._async_run(lambda client: self._async_read(client, uuid))
+
+        # served from the cache within the TTL, concurrent reads share one read over the air
+        return await self.read_cache.async_read(uuid, lambda: self.operations.async_submit(_read, priority))
+
+    async def gatt_transaction(self, steps: Iterable[tuple[str, str, str | None]], priority: int = PRIORITY_INTERACTIVE) -> list[tuple[str, bytearray]]:
+        """Run (operation, target_uuid, hex data) steps in order on one connection, return the values read."""
+        # parse everything before connecting so a bad step does not leave a half applied transaction
+        parsed = [(operation, normalize_uuid(target_uuid), bytearray.fromhex(data) if data is not None else None) for operation, target_uuid, data in steps]
+
+        async def _transaction(client: BleakClientWithServiceCache) -> list[tuple[str, bytearray]]:
+            # every characteristic is resolved before the first step, so a retry never repeats a step
+            for _, uuid, _ in parsed:
+                self._resolve_characteristic(client, uuid)
+            reads: list[tuple[str, bytearray]] = []
+            for operation, uuid, data in parsed:
+                if operation == OPERATION_READ:
+                    reads.append((uuid, await self._async_read(client, uuid)))
                 else:
-                    self._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex(), "mac_address": bytes(manufacturer_data[2:8]).hex() }
-            else:
-                self._manufacturer_data = {manufacturer_id: bytes(manufacturer_data).hex()}
+                    await self._async_write(client, uuid, data, operation == OPERATION_WRITE)
+            return reads
+
+        return await self.operations.async_submit(lambda: self._async_run(_transaction), priority)
+
+    def update_from_advertisement(self, advertisement: Any) -> bool:
+        """Update the device from a Bluetooth advertisement, return False if the payload did not change."""
+        changed = False
+        if advertisement.manufacturer_data:
+            changed = self.update_from_payload(*next(iter(advertisement.manufacturer_data.items())))
+        if self.payload_schema is not None and self.payload_schema.service_uuids and advertisement.service_data:
+            changed = self.update_from_service_data(advertisement.service_data) or changed
+        return changed
+
+    def update_from_payload(self, manufacturer_id: int, payload: bytes) -> bool:
+        """Update the device from a raw manufacturer payload, return False if it did not change."""
+        # compare the raw bytes, decoding is only needed when they changed
+        if self._last_payload is not None and self._last_payload[0] == manufacturer_id and self._last_payload[1] == payload:
+            return False
+        self._last_payload = (manufacturer_id, payload)
+        self.snapshot = get_decoder(manufacturer_id).snapshot(memoryview(payload))
+        if self.payload_schema is not None:
+            self.field_values.update(self.payload_schema.decode(manufacturer_id, payload))
+        return True
+
+    def record_advertisement(self, timestamp: float, rssi: int | None) -> None:
+        """Add an advertisement and the current values to the history, repeated payloads included."""
+        if self.history is not None:
+            self.history.record(timestamp, rssi, self.snapshot.data, self.field_values)
+
+    def update_from_service_data(self, service_data: Mapping[str, bytes]) -> bool:
+        """Decode the schema fields of changed service data payloads, return False if none changed."""
+        changed = False
+        for uuid in self.payload_schema.service_uuids:
+            if (payload := service_data.get(uuid)) is not None and self._service_payloads.get(uuid) != payload:
+                self._service_payloads[uuid] = payload
+                self.field_values.update(self.payload_schema.decode(uuid, payload))
+                changed = True
+        return changed
+
+    @property
+    def last_payload(self) -> tuple[int, bytes] | None:
+        """Return the last raw (manufacturer_id, payload) item."""
+        return self._last_payload
+
+    @property
+    def manufacturer_id(self) -> int | None:
+        """Return the manufacturer ID of the last advertisement."""
+        return self._last_payload[0] if self._last_payload else None
 
     @property
-    def manufacturer_data(self) -> dict[int, str]:
-        """Return the manufacturer data."""
-        return self._manufacturer_data
+    def manufacturer_data(self) -> Mapping[Any, Any]:
+        """Return the decoded manufacturer data, read-only."""
+        return self.snapshot.data
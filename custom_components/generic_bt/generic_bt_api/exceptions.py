@@ -0,0 +1,25 @@
+"""exceptions"""
+
+
+class GenericBTError(Exception):
+    """Base class for Generic BT errors."""
+
+
+class GenericBTTimeout(GenericBTError):
+    """Timeout talking to the device."""
+
+
+class GenericBTBleakError(GenericBTError):
+    """Bleak error talking to the device."""
+
+
+class GenericBTNotConnectable(GenericBTError):
+    """No connectable path to the device is known."""
+
+
+class GenericBTCharacteristicNotFound(GenericBTError):
+    """The characteristic is not part of the device services."""
+
+
+class GenericBTQueueFull(GenericBTError):
+    """Too many operations are queued for the device."""
@@ -0,0 +1,61 @@
+"""bounded advertisement history"""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+
+from .ring_buffer import RingBuffer
+
+
+class AdvertisementHistory:
+    """Timestamps, RSSI and numeric values of the last advertisements, in preallocated ring buffers."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.timestamps = RingBuffer(size)
+        self.rssi = RingBuffer(size)
+        self.values: dict[str, RingBuffer] = {}
+
+    def record(self, timestamp: float, rssi: int | None, *values: Mapping[Any, Any]) -> None:
+        """Record one advertisement with the current values, non numeric values are skipped."""
+        self.timestamps.append(timestamp)
+        if rssi is not None:
+            self.rssi.append(rssi)
+        for mapping in values:
+            for name, value in mapping.items():
+                if not isinstance(name, str) or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if (buffer := self.values.get(name)) is None:
+                    buffer = self.values[name] = RingBuffer(self.size)
+                buffer.append(value)
+
+    @property
+    def rate(self) -> float | None:
+        """Return the advertisements per second over the window."""
+        if self.timestamps.count < 2:
+            return None
+        window = self.timestamps.window()
+        if (span := max(window) - min(window)) <= 0:
+            return None
+        return (self.timestamps.count - 1) / span
+
+    def stats(self) -> dict[str, Any]:
+        """Return the rolling statistics over the window."""
+        stats: dict[str, Any] = {
+            "advertisement_rate": self.rate,
+            "rssi_mean": self.rssi.mean(),
+            "rssi_variance": self.rssi.variance(),
+        }
+        for name, buffer in self.values.items():
+            stats[f"{name}_mean"] = buffer.mean()
+        return stats
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the recorded history, oldest first."""
+        return {
+            "size": self.size,
+            "timestamps": self.timestamps.ordered(),
+            "rssi": self.rssi.ordered(),
+            "values": {name: buffer.ordered() for name, buffer in self.values.items()},
+            "stats": self.stats(),
+        }
@@ -0,0 +1,130 @@
+"""cheap always-on metrics"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+import math
+import time
+from typing import Any
+
+# seconds the rates are averaged over
+RATE_TIME_CONSTANT = 60.0
+# upper bounds of the latency histogram buckets in seconds, the last bucket is open
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RateCounter:
+    """Total count and an exponentially decaying rate per second."""
+
+    __slots__ = ("count", "_rate", "_updated")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._rate = 0.0
+        self._updated = time.monotonic()
+
+    def increment(self) -> None:
+        now = time.monotonic()
+        self._rate = self._rate * math.exp((self._updated - now) / RATE_TIME_CONSTANT) + 1 / RATE_TIME_CONSTANT
+        self._updated = now
+        self.count += 1
+
+    @property
+    def rate(self) -> float:
+        return self._rate * math.exp((self._updated - time.monotonic()) / RATE_TIME_CONSTANT)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"count": self.count, "rate": self.rate}
+
+
+class Histogram:
+    """Durations counted into fixed buckets, recording is a bisect and an increment."""
+
+    __slots__ = ("buckets", "_counts", "count", "total", "max")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self._counts = array("L", bytes(array("L").itemsize * (len(buckets) + 1)))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration: float) -> None:
+        self._counts[bisect_left(self.buckets, duration)] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, fraction: float) -> float | None:
+        """Return the upper bound of the bucket holding the quantile, capped by the max."""
+        if not self.count:
+            return None
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {f"le_{bound:g}": count for bound, count in zip(self.buckets, self._counts)} | {"inf": self._counts[-1]},
+        }
+
+
+class DeviceMetrics:
+    """Advertisement, decode, connection and GATT metrics of one device."""
+
+    __slots__ = (
+        "received",
+        "decoded",
+        "forwarded",
+        "suppressed",
+        "decode_time",
+        "connect_time",
+        "read_time",
+        "write_time",
+        "queue_wait",
+        "connect_failures",
+    )
+
+    def __init__(self) -> None:
+        self.received = RateCounter()
+        self.decoded = RateCounter()
+        self.forwarded = RateCounter()
+        self.suppressed = RateCounter()
+        self.decode_time = Histogram()
+        self.connect_time = Histogram()
+        self.read_time = Histogram()
+        self.write_time = Histogram()
+        self.queue_wait = Histogram()
+        self.connect_failures: dict[str, int] = {}
+
+    def connect_failed(self, exc: BaseException) -> None:
+        """Count a failed connection attempt by the class of its error."""
+        cause = type(exc).__name__
+        self.connect_failures[cause] = self.connect_failures.get(cause, 0) + 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "received": self.received.as_dict(),
+            "decoded": self.decoded.as_dict(),
+            "forwarded": self.forwarded.as_dict(),
+            "suppressed": self.suppressed.as_dict(),
+            "decode_time": self.decode_time.as_dict(),
+            "connect_time": self.connect_time.as_dict(),
+            "read_time": self.read_time.as_dict(),
+            "write_time": self.write_time.as_dict(),
+            "queue_wait": self.queue_wait.as_dict(),
+            "connect_failures": dict(self.connect_failures),
+        }
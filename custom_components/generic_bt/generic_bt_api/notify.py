@@ -0,0 +1,56 @@
+"""gatt notification subscriptions"""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+import struct
+from typing import Any
+
+from .ring_buffer import RingBuffer
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NotifySubscription:
+    """Decode the notifications of one characteristic into a ring buffer of numbers."""
+
+    def __init__(self, uuid: str, value_format: str, offset: int, scale: float, buffer_size: int, max_rate: float) -> None:
+        self.uuid = uuid
+        self.value_format = value_format
+        self._struct = struct.Struct(value_format)
+        self.offset = offset
+        self.scale = scale
+        self.max_rate = max_rate
+        self.buffer = RingBuffer(buffer_size)
+        self.received = 0
+        self.dropped = 0
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call a listener for every decoded notification, return a callback removing it."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def handle_notification(self, _sender: Any, data: bytearray) -> None:
+        """Handle a notification from bleak."""
+        self.received += 1
+        try:
+            value = self._struct.unpack_from(data, self.offset)[0]
+        except struct.error:
+            self.dropped += 1
+            _LOGGER.debug("%s: Notification %s does not match %s at %s", self.uuid, data.hex(), self.value_format, self.offset)
+            return
+        self.buffer.append(value * self.scale)
+        for listener in self._listeners:
+            listener()
+
+    def aggregates(self) -> dict[str, Any]:
+        """Return last, min, max and mean over the buffered window."""
+        buffer = self.buffer
+        return {
+            "last": buffer.last,
+            "min": buffer.min(),
+            "max": buffer.max(),
+            "mean": buffer.mean(),
+            "samples": buffer.count,
+        }
@@ -0,0 +1,153 @@
+"""polls shared by all devices"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import heapq
+import itertools
+import logging
+import random
+from typing import Any
+
+from .const import DEFAULT_POLL_JITTER, DEFAULT_POLL_SPACING, POLL_BACKOFF_FACTOR, POLL_MAX_FACTOR
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _PollTarget:
+    """A periodic poll, its interval grows while the values do not change."""
+
+    __slots__ = ("name", "poll", "adapter", "interval", "max_interval", "current_interval", "removed", "polls", "unchanged", "failures", "deferred", "warned")
+
+    def __init__(self, name: str, poll: Callable[[], Awaitable[bool]], adapter: Callable[[], str | None], interval: float) -> None:
+        self.name = name
+        self.poll = poll
+        self.adapter = adapter
+        self.interval = interval
+        self.max_interval = interval * POLL_MAX_FACTOR
+        self.current_interval = interval
+        self.removed = False
+        self.polls = 0
+        self.unchanged = 0
+        self.failures = 0
+        # polls pushed back by the spacing of the adapter
+        self.deferred = 0
+        self.warned = False
+
+    def adapt(self, changed: bool) -> None:
+        """Go back to the configured interval on a change, back off otherwise."""
+        if changed:
+            self.current_interval = self.interval
+        else:
+            self.current_interval = min(self.current_interval * POLL_BACKOFF_FACTOR, self.max_interval)
+
+
+class PollScheduler:
+    """Run the polls of all devices from one timer.
+
+    Polls are spread with jitter and never start closer than the spacing on the same adapter,
+    so devices configured with the same interval do not fire together. With N devices on one
+    adapter each is polled at most every N times the spacing, whatever its interval.
+    """
+
+    def __init__(self, spacing: float = DEFAULT_POLL_SPACING, jitter: float = DEFAULT_POLL_JITTER) -> None:
+        self.spacing = spacing
+        self.jitter = jitter
+        self._heap: list[tuple[float, int, _PollTarget]] = []
+        self._sequence = itertools.count()
+        self._adapter_next: dict[str | None, float] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._targets: set[_PollTarget] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, name: str, poll: Callable[[], Awaitable[bool]], interval: float, adapter: Callable[[], str | None] = lambda: None) -> Callable[[], None]:
+        """Poll every interval seconds, poll returns if a value changed. Return a callback removing the poll."""
+        target = _PollTarget(name, poll, adapter, interval)
+        self._targets.add(target)
+        # the first poll lands anywhere in the first interval
+        self._push(target, asyncio.get_running_loop().time() + random.uniform(0, interval))
+
+        def _remove() -> None:
+            target.removed = True
+            self._targets.discard(target)
+            self._heap = [item for item in self._heap if item[2] is not target]
+            heapq.heapify(self._heap)
+            self._schedule_timer()
+
+        return _remove
+
+    def _push(self, target: _PollTarget, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._sequence), target))
+        self._schedule_timer()
+
+    def _schedule_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._heap:
+            self._timer = asyncio.get_running_loop().call_at(self._heap[0][0], self._run_due)
+
+    def _run_due(self) -> None:
+        self._timer = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        deferred: list[tuple[float, _PollTarget]] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, target = heapq.heappop(self._heap)
+            adapter = target.adapter()
+            if (free_at := self._adapter_next.get(adapter, 0.0)) > now:
+                # the adapter just started a poll, try again once the spacing is over
+                deferred.append((free_at, target))
+                target.deferred += 1
+                if not target.warned and target.interval < (min_interval := self._min_interval(adapter)):
+                    target.warned = True
+                    _LOGGER.warning(
+                        "%s: Polled every %.1f seconds at most instead of %.1f, the polls of the devices on adapter %s start %.1f seconds apart",
+                        target.name,
+                        min_interval,
+                        target.interval,
+                        adapter,
+                        self.spacing,
+                    )
+                continue
+            self._adapter_next[adapter] = now + self.spacing
+            task = loop.create_task(self._async_poll(target))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        for due, target in deferred:
+            heapq.heappush(self._heap, (due, next(self._sequence), target))
+        self._schedule_timer()
+
+    def _min_interval(self, adapter: str | None) -> float:
+        """Return the shortest interval the devices of an adapter can be polled at."""
+        return self.spacing * sum(1 for target in self._targets if target.adapter() == adapter)
+
+    async def _async_poll(self, target: _PollTarget) -> None:
+        changed = False
+        try:
+            changed = await target.poll()
+        except Exception:  # pylint: disable=broad-except
+            target.failures += 1
+            _LOGGER.debug("%s: Poll failed", target.name, exc_info=True)
+        target.polls += 1
+        if not changed:
+            target.unchanged += 1
+        target.adapt(changed)
+        if not target.removed:
+            interval = target.current_interval
+            self._push(target, asyncio.get_running_loop().time() + random.uniform(interval * (1 - self.jitter), interval * (1 + self.jitter)))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the scheduled polls."""
+        return {
+            target.name: {
+                "interval": target.interval,
+                "current_interval": target.current_interval,
+                "polls": target.polls,
+                "unchanged": target.unchanged,
+                "failures": target.failures,
+                "deferred": target.deferred,
+                "min_interval": self._min_interval(target.adapter()),
+            }
+            for target in self._targets
+        }
@@ -0,0 +1,104 @@
+"""per device gatt read cache"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine, Mapping
+import re
+import time
+from typing import Any
+
+from .uuids import normalize_uuid
+
+
+def parse_ttl_list(text: str) -> dict[str, float]:
+    """Return the TTL in seconds per UUID of a comma or newline separated list of uuid=ttl, raise ValueError on a bad one."""
+    ttls: dict[str, float] = {}
+    for item in re.split(r"[\n,]+", text):
+        if not (item := item.strip()):
+            continue
+        uuid, separator, ttl = item.partition("=")
+        if not separator:
+            raise ValueError(f"{item} is not uuid=ttl")
+        if (seconds := float(ttl)) < 0:
+            raise ValueError(f"negative TTL for {uuid}")
+        ttls[normalize_uuid(uuid.strip())] = seconds
+    return ttls
+
+
+class _CachedValue:
+    __slots__ = ("value", "read_at")
+
+    def __init__(self, value: bytes, read_at: float) -> None:
+        self.value = value
+        self.read_at = read_at
+
+
+class ReadCache:
+    """Values read from the characteristics with a TTL, and the reads in flight.
+
+    Concurrent reads of a characteristic share one read over the air, cached or not.
+    The shared read runs as its own task, a caller giving up does not cancel it for the others.
+    """
+
+    def __init__(self, ttls: Mapping[str, float] | None = None) -> None:
+        self.ttls = dict(ttls or {})
+        self._values: dict[str, _CachedValue] = {}
+        self._in_flight: dict[str, asyncio.Task[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+
+    def get(self, uuid: str) -> bytes | None:
+        """Return the value of a characteristic if it was read within its TTL."""
+        if (cached := self._values.get(uuid)) is None or time.monotonic() - cached.read_at >= self.ttls[uuid]:
+            return None
+        return cached.value
+
+    def set(self, uuid: str, value: bytes) -> None:
+        """Store a value read from a characteristic, characteristics without a TTL are not kept."""
+        if self.ttls.get(uuid):
+            self._values[uuid] = _CachedValue(bytes(value), time.monotonic())
+
+    def invalidate(self, uuid: str) -> None:
+        """Forget the value of a characteristic, it was written."""
+        self._values.pop(uuid, None)
+
+    def values(self) -> dict[str, bytes]:
+        """Return the values that are still within their TTL."""
+        now = time.monotonic()
+        return {uuid: cached.value for uuid, cached in self._values.items() if now - cached.read_at < self.ttls[uuid]}
+
+    async def async_read(self, uuid: str, read: Callable[[], Coroutine[Any, Any, bytes]]) -> bytes:
+        """Return the cached value, or join the read in flight, or read the characteristic.
+
+        The value is cached by the read itself, so a write invalidating it in the
+        meantime is not undone when the read completes.
+        """
+        if (value := self.get(uuid)) is not None:
+            self.hits += 1
+            return value
+        if (task := self._in_flight.get(uuid)) is not None:
+            self.collapsed += 1
+        else:
+            self.misses += 1
+            task = self._in_flight[uuid] = asyncio.get_running_loop().create_task(read())
+            task.add_done_callback(lambda done: self._read_done(uuid, done))
+        return bytes(await asyncio.shield(task))
+
+    def _read_done(self, uuid: str, task: asyncio.Task[bytes]) -> None:
+        if self._in_flight.get(uuid) is task:
+            del self._in_flight[uuid]
+        # every caller may have given up, do not log the exception as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the TTLs, the counters and the cached values with their age."""
+        now = time.monotonic()
+        return {
+            "ttls": self.ttls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "values": {uuid: {"value": cached.value.hex(), "age": now - cached.read_at} for uuid, cached in self._values.items()},
+        }
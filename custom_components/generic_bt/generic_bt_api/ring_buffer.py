@@ -0,0 +1,60 @@
+"""fixed size numeric ring buffer"""
+from __future__ import annotations
+
+from array import array
+
+
+class RingBuffer:
+    """Preallocated buffer of floats, the oldest value is overwritten when it is full."""
+
+    __slots__ = ("_values", "_size", "_next", "count")
+
+    def __init__(self, size: int) -> None:
+        self._values = array("d", bytes(8 * size))
+        self._size = size
+        self._next = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, value: float) -> None:
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self._size
+        if self.count < self._size:
+            self.count += 1
+
+    def clear(self) -> None:
+        self._next = 0
+        self.count = 0
+
+    def window(self) -> memoryview:
+        """Return the stored values, oldest first when the buffer did not wrap."""
+        if self.count < self._size:
+            return memoryview(self._values)[: self.count]
+        return memoryview(self._values)
+
+    def ordered(self) -> list[float]:
+        """Return the stored values, oldest first."""
+        if self.count < self._size:
+            return self._values[: self.count].tolist()
+        return self._values[self._next :].tolist() + self._values[: self._next].tolist()
+
+    @property
+    def last(self) -> float | None:
+        return self._values[self._next - 1] if self.count else None
+
+    def min(self) -> float | None:
+        return min(self.window()) if self.count else None
+
+    def max(self) -> float | None:
+        return max(self.window()) if self.count else None
+
+    def mean(self) -> float | None:
+        return sum(self.window()) / self.count if self.count else None
+
+    def variance(self) -> float | None:
+        if not self.count:
+            return None
+        mean = sum(self.window()) / self.count
+        return sum((value - mean) ** 2 for value in self.window()) / self.count
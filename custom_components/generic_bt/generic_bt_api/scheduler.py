@@ -0,0 +1,133 @@
+"""per device gatt operation queue"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+import heapq
+import itertools
+import logging
+from typing import Any
+
+from .const import DEFAULT_MAX_PENDING_OPERATIONS, PRIORITY_INTERACTIVE
+from .exceptions import GenericBTError, GenericBTQueueFull
+from .metrics import Histogram
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Operation:
+    """A queued operation, ordered by priority and then by submission."""
+
+    __slots__ = ("priority", "sequence", "run", "future", "coalesce_key", "queued")
+
+    def __init__(self, priority: int, sequence: int, run: Callable[[], Awaitable[Any]], future: asyncio.Future, coalesce_key: Hashable | None, queued: float) -> None:
+        self.priority = priority
+        self.sequence = sequence
+        self.run = run
+        self.future = future
+        self.coalesce_key = coalesce_key
+        self.queued = queued
+
+    def __lt__(self, other: _Operation) -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class OperationQueue:
+    """Run the operations of one device one at a time, interactive ones before background ones.
+
+    Operations submitted with the same coalesce key while one is still queued replace it,
+    so only the latest value is sent and every caller gets its result. The time from
+    queueing to starting is recorded in wait_time, coalesced operations count from the first.
+    """
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING_OPERATIONS, wait_time: Histogram | None = None) -> None:
+        self.max_pending = max_pending
+        self.wait_time = wait_time if wait_time is not None else Histogram()
+        self._heap: list[_Operation] = []
+        self._coalescable: dict[Hashable, _Operation] = {}
+        self._sequence = itertools.count()
+        self._worker: asyncio.Task | None = None
+        self.completed = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        """Return the number of queued operations."""
+        return len(self._heap)
+
+    async def async_submit(self, run: Callable[[], Awaitable[Any]], priority: int = PRIORITY_INTERACTIVE, coalesce_key: Hashable | None = None) -> Any:
+        """Queue an operation and wait for its result."""
+        if coalesce_key is not None and (queued := self._coalescable.get(coalesce_key)) is not None:
+            queued.run = run
+            if priority < queued.priority:
+                queued.priority = priority
+                heapq.heapify(self._heap)
+            self.coalesced += 1
+            return await asyncio.shield(queued.future)
+        if len(self._heap) >= self.max_pending and not self._make_room(priority):
+            self.rejected += 1
+            raise GenericBTQueueFull(f"{len(self._heap)} operations are already queued")
+        loop = asyncio.get_running_loop()
+        operation = _Operation(priority, next(self._sequence), run, loop.create_future(), coalesce_key, loop.time())
+        heapq.heappush(self._heap, operation)
+        if coalesce_key is not None:
+            self._coalescable[coalesce_key] = operation
+        if self._worker is None:
+            self._worker = loop.create_task(self._async_work())
+        return await asyncio.shield(operation.future)
+
+    def _make_room(self, priority: int) -> bool:
+        """Drop the newest queued operation of a lower priority, return if one was dropped."""
+        lower = [operation for operation in self._heap if operation.priority > priority]
+        if not lower:
+            return False
+        dropped = max(lower, key=lambda operation: (operation.priority, operation.sequence))
+        self._heap.remove(dropped)
+        heapq.heapify(self._heap)
+        self._forget(dropped)
+        self.rejected += 1
+        dropped.future.set_exception(GenericBTQueueFull("Dropped for an operation of a higher priority"))
+        return True
+
+    def _forget(self, operation: _Operation) -> None:
+        if operation.coalesce_key is not None and self._coalescable.get(operation.coalesce_key) is operation:
+            del self._coalescable[operation.coalesce_key]
+
+    async def _async_work(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._heap:
+                operation = heapq.heappop(self._heap)
+                self.wait_time.record(loop.time() - operation.queued)
+                # from now on the value is fixed, later writes queue again
+                self._forget(operation)
+                try:
+                    result = await operation.run()
+                except Exception as exc:  # pylint: disable=broad-except
+                    if not operation.future.done():
+                        operation.future.set_exception(exc)
+                else:
+                    if not operation.future.done():
+                        operation.future.set_result(result)
+                self.completed += 1
+        finally:
+            self._worker = None
+
+    async def async_stop(self) -> None:
+        """Fail the queued operations and wait for the running one."""
+        while self._heap:
+            operation = heapq.heappop(self._heap)
+            self._forget(operation)
+            operation.future.set_exception(GenericBTError("Device stopped"))
+        if self._worker is not None:
+            await asyncio.wait([self._worker])
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the queue counters."""
+        return {
+            "pending": len(self._heap),
+            "completed": self.completed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,146 @@
+"""declarative payload schemas"""
+from __future__ import annotations
+
+from collections.abc import Iterable
+import struct
+from typing import Any
+
+from .uuids import normalize_uuid
+
+BYTE_ORDERS = "<>!="
+FIELD_TYPES = "bBhHiIlLqQefd?"
+
+
+class FieldSpec:
+    """One numeric field of a manufacturer or service data payload."""
+
+    __slots__ = ("source", "name", "offset", "value_format", "scale", "unit")
+
+    def __init__(self, source: int | str, name: str, offset: int, value_format: str, scale: float = 1.0, unit: str | None = None) -> None:
+        self.source = source
+        self.name = name
+        self.offset = offset
+        self.value_format = value_format
+        self.scale = scale
+        self.unit = unit
+
+    @property
+    def byte_order(self) -> str:
+        return self.value_format[0]
+
+    @property
+    def size(self) -> int:
+        return struct.calcsize(self.value_format)
+
+    @property
+    def numeric(self) -> bool:
+        """Return if the field is a number, ? fields are booleans."""
+        return self.value_format[1] != "?"
+
+
+def _parse_source(text: str) -> int | str:
+    """Manufacturer IDs are integers, decimal or 0x prefixed, anything else is a service UUID."""
+    try:
+        return int(text, 0)
+    except ValueError:
+        return normalize_uuid(text.lower())
+
+
+def _parse_format(text: str) -> str:
+    """Return the struct format of a field type, little endian unless a byte order is given."""
+    if text[:1] not in BYTE_ORDERS:
+        text = "<" + text
+    if len(text) != 2 or text[1] not in FIELD_TYPES:
+        raise ValueError(f"unsupported type {text}")
+    return text
+
+
+def parse_schema(text: str) -> list[FieldSpec]:
+    """Parse "source, name, offset, type[, scale[, unit]]" lines, raise ValueError on a bad line.
+
+    Blank lines and lines starting with # are skipped.
+    """
+    fields: list[FieldSpec] = []
+    names: set[str] = set()
+    for number, line in enumerate(text.splitlines(), 1):
+        if not (line := line.strip()) or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split(",")]
+        if not 4 <= len(parts) <= 6:
+            raise ValueError(f"line {number}: expected source, name, offset, type[, scale[, unit]]")
+        try:
+            field = FieldSpec(
+                _parse_source(parts[0]),
+                parts[1],
+                int(parts[2], 0),
+                _parse_format(parts[3]),
+                float(parts[4]) if len(parts) > 4 and parts[4] else 1.0,
+                parts[5] if len(parts) > 5 and parts[5] else None,
+            )
+        except ValueError as exc:
+            raise ValueError(f"line {number}: {exc}") from exc
+        if not field.name or field.name in names:
+            raise ValueError(f"line {number}: field names must be set and unique")
+        if field.offset < 0:
+            raise ValueError(f"line {number}: offset must not be negative")
+        names.add(field.name)
+        fields.append(field)
+    return fields
+
+
+class _SourceDecoder:
+    """The fields of one source compiled into a single struct when they do not overlap."""
+
+    __slots__ = ("fields", "_struct", "_scales")
+
+    def __init__(self, fields: list[FieldSpec]) -> None:
+        self.fields = sorted(fields, key=lambda field: field.offset)
+        self._struct: struct.Struct | None = None
+        self._scales = tuple(field.scale for field in self.fields)
+        byte_orders = {field.byte_order for field in self.fields}
+        if len(byte_orders) == 1:
+            parts: list[str] = []
+            end = 0
+            for field in self.fields:
+                if field.offset < end:
+                    break
+                parts.append(f"{field.offset - end}x" if field.offset > end else "")
+                parts.append(field.value_format[1])
+                end = field.offset + field.size
+            else:
+                self._struct = struct.Struct(byte_orders.pop() + "".join(parts))
+
+    def decode(self, payload: bytes | memoryview) -> dict[str, Any]:
+        if self._struct is not None and len(payload) >= self._struct.size:
+            values = self._struct.unpack_from(payload)
+            return {field.name: value * scale if scale != 1.0 else value for field, value, scale in zip(self.fields, values, self._scales)}
+        # overlapping fields or a short payload, decode the fields that fit one by one
+        decoded: dict[str, Any] = {}
+        for field in self.fields:
+            if len(payload) >= field.offset + field.size:
+                value = struct.unpack_from(field.value_format, payload, field.offset)[0]
+                decoded[field.name] = value * field.scale if field.scale != 1.0 else value
+        return decoded
+
+
+class PayloadSchema:
+    """Fields decoded from manufacturer data and service data payloads."""
+
+    def __init__(self, fields: Iterable[FieldSpec]) -> None:
+        self.fields = list(fields)
+        by_source: dict[int | str, list[FieldSpec]] = {}
+        for field in self.fields:
+            by_source.setdefault(field.source, []).append(field)
+        self._decoders = {source: _SourceDecoder(source_fields) for source, source_fields in by_source.items()}
+        self.service_uuids = tuple(source for source in self._decoders if isinstance(source, str))
+
+    @classmethod
+    def from_text(cls, text: str) -> PayloadSchema | None:
+        """Compile a schema text, None if it has no fields."""
+        return cls(fields) if (fields := parse_schema(text)) else None
+
+    def decode(self, source: int | str, payload: bytes | memoryview) -> dict[str, Any]:
+        """Return the values of the fields of a source found in a payload."""
+        if (decoder := self._decoders.get(source)) is None:
+            return {}
+        return decoder.decode(payload)
@@ -0,0 +1,46 @@
+"""immutable decoded device state"""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any
+
+
+class DeviceSnapshot:
+    """The state decoded from one payload, shared read-only by all entities of a device.
+
+    A new snapshot replaces the old one when the payload changes, nothing is
+    recomputed or copied when the entities write their state.
+    """
+
+    __slots__ = ("manufacturer_id", "data", "attributes", "value", "value_attributes")
+
+    manufacturer_id: int | None
+    data: Mapping[Any, Any]
+    attributes: Mapping[Any, Any]
+    value: Any
+    value_attributes: Mapping[Any, Any]
+
+    def __init__(self, manufacturer_id: int | None, data: dict[Any, Any], value: Any, value_attributes: dict[Any, Any] | None = None) -> None:
+        attributes = MappingProxyType(data if manufacturer_id is None else {**data, "manufacturer_id": manufacturer_id})
+        _set_manufacturer_id(self, manufacturer_id)
+        # the decoded values, without the manufacturer ID
+        _set_data(self, MappingProxyType(data))
+        _set_attributes(self, attributes)
+        # the state of the manufacturer data sensor and its attributes
+        _set_value(self, value)
+        _set_value_attributes(self, attributes if value_attributes is None else MappingProxyType(value_attributes))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+# the slot setters bypass __setattr__, a snapshot is built on every changed payload
+_set_manufacturer_id = DeviceSnapshot.manufacturer_id.__set__  # type: ignore[attr-defined]
+_set_data = DeviceSnapshot.data.__set__  # type: ignore[attr-defined]
+_set_attributes = DeviceSnapshot.attributes.__set__  # type: ignore[attr-defined]
+_set_value = DeviceSnapshot.value.__set__  # type: ignore[attr-defined]
+_set_value_attributes = DeviceSnapshot.value_attributes.__set__  # type: ignore[attr-defined]
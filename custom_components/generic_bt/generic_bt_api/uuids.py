@@ -0,0 +1,18 @@
+"""characteristic uuid helpers"""
+from __future__ import annotations
+
+from functools import lru_cache
+import re
+from uuid import UUID
+
+
+@lru_cache(maxsize=512)
+def normalize_uuid(target_uuid: str) -> str:
+    """Return the canonical form of a characteristic UUID string."""
+    return str(UUID("{" + target_uuid.strip("{}") + "}"))
+
+
+def parse_uuid_list(text: str) -> list[str]:
+    """Return the canonical UUIDs of a comma or whitespace separated list, raise ValueError on a bad one."""
+    return [normalize_uuid(uuid) for uuid in re.split(r"[\s,]+", text) if uuid]
+
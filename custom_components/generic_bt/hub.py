@@ -0,0 +1,119 @@
+"""Shared hub dispatching advertisements to the device coordinators."""
+from __future__ import annotations
+
+from datetime import timedelta
+from functools import partial
+import logging
+from typing import Any
+
+from bluetooth_data_tools import monotonic_time_coarse
+
+from homeassistant.components import bluetooth
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DATA_HUB, UNAVAILABLE_SECONDS
+from .coordinator import GenericBTCoordinator
+from .generic_bt_api.metrics import RateCounter
+
+_LOGGER = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = timedelta(seconds=30)
+
+
+@callback
+def async_get_hub(hass: HomeAssistant) -> GenericBTHub:
+    """Return the hub, creating it on first use."""
+    if (hub := hass.data.get(DATA_HUB)) is None:
+        hub = hass.data[DATA_HUB] = GenericBTHub(hass)
+    return hub
+
+
+class GenericBTHub:
+    """Register one Bluetooth callback per manufacturer ID and dispatch by address."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the hub."""
+        self.hass = hass
+        self._coordinators: dict[str, GenericBTCoordinator] = {}
+        self._last_service_info: dict[str, bluetooth.BluetoothServiceInfoBleak] = {}
+        # matcher key -> [registered coordinators, unregister callback]
+        self._matchers: dict[tuple, list] = {}
+        self._unsub_sweep: CALLBACK_TYPE | None = None
+        self.received = RateCounter()
+        self.ignored = RateCounter()
+
+    @property
+    def coordinators(self) -> dict[str, GenericBTCoordinator]:
+        """Return the coordinators by address."""
+        return self._coordinators
+
+    @callback
+    def async_add(self, coordinator: GenericBTCoordinator, manufacturer_id: int | None) -> CALLBACK_TYPE:
+        """Add a device to the hub, return a callback removing it again."""
+        address = coordinator.address
+        self._coordinators[address] = coordinator
+        # devices with an unknown manufacturer are matched by their address
+        if manufacturer_id is not None:
+            key = ("manufacturer_id", manufacturer_id, coordinator.connectable, coordinator.mode)
+            matcher = bluetooth.BluetoothCallbackMatcher(manufacturer_id=manufacturer_id, connectable=coordinator.connectable)
+        else:
+            key = ("address", address, coordinator.connectable, coordinator.mode)
+            matcher = bluetooth.BluetoothCallbackMatcher(address=address, connectable=coordinator.connectable)
+        if (registration := self._matchers.get(key)) is None:
+            handler = partial(self._async_handle_bluetooth_event, coordinator.connectable)
+            registration = self._matchers[key] = [0, bluetooth.async_register_callback(self.hass, handler, matcher, coordinator.mode)]
+        registration[0] += 1
+        if self._unsub_sweep is None:
+            self._unsub_sweep = async_track_time_interval(self.hass, self._async_check_unavailable, SWEEP_INTERVAL)
+
+        @callback
+        def _async_remove() -> None:
+            self._async_remove(address, key)
+
+        return _async_remove
+
+    @callback
+    def _async_remove(self, address: str, key: tuple) -> None:
+        if (coordinator := self._coordinators.pop(address, None)) is not None:
+            coordinator._async_stop()
+        self._last_service_info.pop(address, None)
+        registration = self._matchers[key]
+        registration[0] -= 1
+        if not registration[0]:
+            registration[1]()
+            del self._matchers[key]
+        if not self._coordinators:
+            if self._unsub_sweep:
+                self._unsub_sweep()
+                self._unsub_sweep = None
+            self.hass.data.pop(DATA_HUB, None)
+
+    @callback
+    def _async_handle_bluetooth_event(self, connectable: bool, service_info: bluetooth.BluetoothServiceInfoBleak, change: bluetooth.BluetoothChange) -> None:
+        """Dispatch an advertisement to the coordinator of its address."""
+        self.received.increment()
+        # passive registrations also hear connectable devices, only deliver through the coordinator's own one
+        if (coordinator := self._coordinators.get(service_info.address)) is None or coordinator.connectable is not connectable:
+            self.ignored.increment()
+            return
+        self._last_service_info[service_info.address] = service_info
+        coordinator._async_handle_bluetooth_event(service_info, change)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the hub registrations and dispatch counters."""
+        return {
+            "devices": len(self._coordinators),
+            "registrations": {" ".join(str(part) for part in key): registration[0] for key, registration in self._matchers.items()},
+            "received": self.received.as_dict(),
+            "ignored": self.ignored.as_dict(),
+        }
+
+    @callback
+    def _async_check_unavailable(self, _now) -> None:
+        """Mark the devices that stopped advertising as unavailable."""
+        stale_before = monotonic_time_coarse() - UNAVAILABLE_SECONDS
+        for address, service_info in list(self._last_service_info.items()):
+            if service_info.time < stale_before:
+                del self._last_service_info[address]
+                self._coordinators[address]._async_handle_unavailable(service_info)
@@ -1,33 +1,161 @@
 """Support for Generic BT sensor to store manufacturer data."""
 from __future__ import annotations
 
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
 import logging
+from typing import Any
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorEntityDescription, SensorStateClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
+from .const import CONF_METRIC_SENSORS, DEFAULT_METRIC_SENSORS, DOMAIN, SIGNAL_NOTIFY_SUBSCRIBED, SIGNAL_NOTIFY_UNSUBSCRIBED
 from .coordinator import GenericBTCoordinator
 from .entity import GenericBTEntity
+from .generic_bt_api.const import MANUFACTURER_ID_1076, MANUFACTURER_ID_65535
+from .generic_bt_api.metrics import DeviceMetrics, Histogram
+from .generic_bt_api.notify import NotifySubscription
+from .generic_bt_api.schema import FieldSpec
 
 # Initialize the logger
 _LOGGER = logging.getLogger(__name__)
 PARALLEL_UPDATES = 0
 
+
+def _histogram_attributes(histogram: Histogram, factor: float) -> dict[str, Any]:
+    """Return count and the p50, p95 and max of a histogram, in the unit of the sensor."""
+    p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+    return {
+        "count": histogram.count,
+        "p50": p50 * factor if p50 is not None else None,
+        "p95": p95 * factor if p95 is not None else None,
+        "max": histogram.max * factor,
+    }
+
+
+@dataclass(frozen=True, kw_only=True)
+class GenericBTMetricSensorEntityDescription(SensorEntityDescription):
+    """Describes a metric sensor."""
+
+    value_fn: Callable[[DeviceMetrics], Any]
+    attributes_fn: Callable[[DeviceMetrics], dict[str, Any]] | None = None
+    # passive entries never connect, the connection metrics would stay empty
+    connection: bool = False
+
+
+_RATE = {"native_unit_of_measurement": "1/s", "state_class": SensorStateClass.MEASUREMENT, "suggested_display_precision": 3}
+_MILLISECONDS = {
+    "native_unit_of_measurement": UnitOfTime.MILLISECONDS,
+    "device_class": SensorDeviceClass.DURATION,
+    "state_class": SensorStateClass.MEASUREMENT,
+    "suggested_display_precision": 1,
+}
+
+METRIC_SENSORS: tuple[GenericBTMetricSensorEntityDescription, ...] = (
+    GenericBTMetricSensorEntityDescription(key="received", name="Advertisements received", value_fn=lambda metrics: metrics.received.rate, **_RATE),
+    GenericBTMetricSensorEntityDescription(key="decoded", name="Advertisements decoded", value_fn=lambda metrics: metrics.decoded.rate, **_RATE),
+    GenericBTMetricSensorEntityDescription(key="forwarded", name="Advertisements forwarded", value_fn=lambda metrics: metrics.forwarded.rate, **_RATE),
+    GenericBTMetricSensorEntityDescription(key="suppressed", name="Advertisements suppressed", value_fn=lambda metrics: metrics.suppressed.rate, **_RATE),
+    GenericBTMetricSensorEntityDescription(
+        key="decode_time",
+        name="Decode time",
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=1,
+        value_fn=lambda metrics: metrics.decode_time.mean * 1e6 if metrics.decode_time.count else None,
+        attributes_fn=lambda metrics: _histogram_attributes(metrics.decode_time, 1e6),
+    ),
+    GenericBTMetricSensorEntityDescription(
+        key="connect_time",
+        name="Connect latency",
+        value_fn=lambda metrics: metrics.connect_time.mean * 1e3 if metrics.connect_time.count else None,
+        attributes_fn=lambda metrics: _histogram_attributes(metrics.connect_time, 1e3),
+        connection=True,
+        **_MILLISECONDS,
+    ),
+    GenericBTMetricSensorEntityDescription(
+        key="read_time",
+        name="GATT read latency",
+        value_fn=lambda metrics: metrics.read_time.mean * 1e3 if metrics.read_time.count else None,
+        attributes_fn=lambda metrics: _histogram_attributes(metrics.read_time, 1e3),
+        connection=True,
+        **_MILLISECONDS,
+    ),
+    GenericBTMetricSensorEntityDescription(
+        key="write_time",
+        name="GATT write latency",
+        value_fn=lambda metrics: metrics.write_time.mean * 1e3 if metrics.write_time.count else None,
+        attributes_fn=lambda metrics: _histogram_attributes(metrics.write_time, 1e3),
+        connection=True,
+        **_MILLISECONDS,
+    ),
+    GenericBTMetricSensorEntityDescription(
+        key="queue_wait",
+        name="Queue wait",
+        value_fn=lambda metrics: metrics.queue_wait.mean * 1e3 if metrics.queue_wait.count else None,
+        attributes_fn=lambda metrics: _histogram_attributes(metrics.queue_wait, 1e3),
+        connection=True,
+        **_MILLISECONDS,
+    ),
+    GenericBTMetricSensorEntityDescription(
+        key="connect_failures",
+        name="Connection failures",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: sum(metrics.connect_failures.values()),
+        attributes_fn=lambda metrics: dict(metrics.connect_failures),
+        connection=True,
+    ),
+)
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
     """Set up Generic BT device based on a config entry."""
     coordinator: GenericBTCoordinator = hass.data[DOMAIN][entry.entry_id]
-    manufacturer_data = coordinator.device.manufacturer_data
-    # Ensure manufacturer_id is included in the data
-    if "manufacturer_id" not in manufacturer_data and manufacturer_data:
-        # Extract the manufacturer_id from the keys
-        manufacturer_id = list(manufacturer_data.keys())[0]
-        manufacturer_data["manufacturer_id"] = manufacturer_id
-
-    if manufacturer_data.get("manufacturer_id") == 65535 or manufacturer_data.get("manufacturer_id") == 1076:
+    if coordinator.manufacturer_id in (MANUFACTURER_ID_65535, MANUFACTURER_ID_1076):
         async_add_entities([GenericBTManufacturerDataSensor(coordinator)])
+    if coordinator.device.history is not None:
+        async_add_entities([GenericBTAdvertisementRateSensor(coordinator)])
+    if coordinator.options.get(CONF_METRIC_SENSORS, DEFAULT_METRIC_SENSORS):
+        async_add_entities(
+            GenericBTMetricSensor(coordinator, description) for description in METRIC_SENSORS if coordinator.connectable or not description.connection
+        )
+    if (payload_schema := coordinator.device.payload_schema) is not None:
+        async_add_entities(GenericBTFieldSensor(coordinator, field) for field in payload_schema.fields)
+
+    # subscriptions do not survive a restart and fields may have left the schema,
+    # drop the sensors left from the last run
+    registry = er.async_get(hass)
+    notify_prefix = f"{coordinator.base_unique_id}-notify-"
+    field_prefix = f"{coordinator.base_unique_id}-field-"
+    field_unique_ids = {f"{field_prefix}{field.name}" for field in payload_schema.fields} if payload_schema is not None else set()
+    for registry_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+        if registry_entry.unique_id.startswith(notify_prefix) or (
+            registry_entry.unique_id.startswith(field_prefix) and registry_entry.unique_id not in field_unique_ids
+        ):
+            registry.async_remove(registry_entry.entity_id)
+
+    notify_sensors: dict[str, GenericBTNotifySensor] = {}
+
+    @callback
+    def _async_subscribed(subscription: NotifySubscription) -> None:
+        if (sensor := notify_sensors.get(subscription.uuid)) is not None:
+            sensor.async_set_subscription(subscription)
+            return
+        notify_sensors[subscription.uuid] = GenericBTNotifySensor(coordinator, subscription)
+        async_add_entities([notify_sensors[subscription.uuid]])
+
+    @callback
+    def _async_unsubscribed(uuid: str) -> None:
+        if (sensor := notify_sensors.pop(uuid, None)) is not None and sensor.entity_id:
+            registry.async_remove(sensor.entity_id)
+
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_NOTIFY_SUBSCRIBED.format(coordinator.address), _async_subscribed))
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_NOTIFY_UNSUBSCRIBED.format(coordinator.address), _async_unsubscribed))
 
 class GenericBTManufacturerDataSensor(GenericBTEntity, SensorEntity):
     """Representation of a Generic BT Manufacturer Data Sensor."""
@@ -37,34 +165,179 @@ class GenericBTManufacturerDataSensor(GenericBTEntity, SensorEntity):
     def __init__(self, coordinator: GenericBTCoordinator) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
-
-    def _get_manufacturer_data(self) -> dict:
-        """Return the manufacturer data from the device."""
-        manufacturer_data = self._device.manufacturer_data
-        # Ensure manufacturer_id is included in the data
-        if "manufacturer_id" not in manufacturer_data and manufacturer_data:
-            # Extract the manufacturer_id from the keys
-            manufacturer_id = list(manufacturer_data.keys())[0]
-            manufacturer_data["manufacturer_id"] = manufacturer_id
-        return manufacturer_data
+        if coordinator.manufacturer_id == MANUFACTURER_ID_65535:
+            self._attr_state_class = SensorStateClass.MEASUREMENT
 
     @property
-    def native_value(self) -> float | dict:
-        """Return the size value or manufacturer data based on manufacturer_id."""
-        manufacturer_data = self._get_manufacturer_data()
-        if manufacturer_data.get("manufacturer_id") == 65535:
-            return manufacturer_data.get("size", 0.0)
-        return manufacturer_data
+    def native_value(self) -> float | str | None:
+        """Return the size value or the hex payload, as decoded for the manufacturer ID."""
+        return self._device.snapshot.value
+
+    def _throttle_value(self) -> float | str | None:
+        return self._device.snapshot.value
 
     @property
-    def extra_state_attributes(self) -> dict[str, any]:
+    def extra_state_attributes(self) -> Mapping[str, Any]:
         """Return the device state attributes."""
-        manufacturer_data = self._get_manufacturer_data()
-        if manufacturer_data.get("manufacturer_id") == 65535:
-            return {"size": manufacturer_data.get("size", 0.0)}
-        return manufacturer_data
+        return self._device.snapshot.value_attributes
 
     @property
     def icon(self) -> str:
         """Return the icon for the sensor."""
         return "mdi:bluetooth"
+
+
+class GenericBTNotifySensor(GenericBTEntity, SensorEntity):
+    """Values notified by a characteristic, written at most max_rate times per second."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:chart-bell-curve"
+    _unrecorded_attributes = GenericBTEntity._unrecorded_attributes | {"samples", "received", "dropped"}
+
+    def __init__(self, coordinator: GenericBTCoordinator, subscription: NotifySubscription) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{coordinator.base_unique_id}-notify-{subscription.uuid}"
+        self._attr_name = f"Notify {subscription.uuid}"
+        self._subscription = subscription
+        self._remove_listener: Callable[[], None] | None = None
+        self._options_min_interval = self._min_interval
+
+    async def async_added_to_hass(self) -> None:
+        """Listen to the notifications."""
+        await super().async_added_to_hass()
+        self.async_set_subscription(self._subscription)
+        self.async_on_remove(self._async_remove_listener)
+
+    @callback
+    def async_set_subscription(self, subscription: NotifySubscription) -> None:
+        """Follow a new subscription to the same characteristic."""
+        self._async_remove_listener()
+        self._subscription = subscription
+        # notifications go through the same throttle as advertisements, with the rate as interval
+        self._min_interval = max(self._options_min_interval, 1 / subscription.max_rate)
+        self._remove_listener = subscription.add_listener(self._handle_coordinator_update)
+        self._async_write_throttled_state()
+
+    @callback
+    def _async_remove_listener(self) -> None:
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+
+    @property
+    def available(self) -> bool:
+        """Return if the device is connected and the values are current."""
+        return super().available and self._device.connected
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the last notified value."""
+        return self._subscription.buffer.last
+
+    def _throttle_value(self) -> float | None:
+        return self._subscription.buffer.last
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return min, max and mean over the buffered values."""
+        aggregates = self._subscription.aggregates()
+        del aggregates["last"]
+        aggregates["received"] = self._subscription.received
+        aggregates["dropped"] = self._subscription.dropped
+        return aggregates
+
+
+class GenericBTFieldSensor(GenericBTEntity, SensorEntity):
+    """A field of the payload schema, written only when its own value changed."""
+
+    def __init__(self, coordinator: GenericBTCoordinator, field: FieldSpec) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._field = field.name
+        self._attr_unique_id = f"{coordinator.base_unique_id}-field-{field.name}"
+        self._attr_name = field.name
+        self._attr_native_unit_of_measurement = field.unit
+        # booleans get no long-term statistics
+        if field.numeric:
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self) -> Any:
+        """Return the decoded value."""
+        return self._device.field_values.get(self._field)
+
+    def _throttle_value(self) -> Any:
+        return self._device.field_values.get(self._field)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        # the advertisement may only have changed other fields
+        if self.available == self._written_available and self._device.field_values.get(self._field) == self._written_value:
+            return
+        super()._handle_coordinator_update()
+
+
+class GenericBTAdvertisementRateSensor(GenericBTEntity, SensorEntity):
+    """Advertisements per second over the history, with the rolling statistics as attributes."""
+
+    _attr_name = "Advertisement rate"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "1/s"
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:broadcast"
+    # repeated payloads do not reach the entities, refresh the statistics on the platform scan interval
+    _attr_should_poll = True
+
+    def __init__(self, coordinator: GenericBTCoordinator) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{coordinator.base_unique_id}-advertisement-rate"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the advertisement rate."""
+        return self._device.history.rate
+
+    def _throttle_value(self) -> float | None:
+        return self._device.history.rate
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return RSSI mean and variance and the moving averages of the values."""
+        stats = self._device.history.stats()
+        del stats["advertisement_rate"]
+        return stats
+
+
+class GenericBTMetricSensor(GenericBTEntity, SensorEntity):
+    """A metric of the device, refreshed on the platform scan interval rather than per advertisement."""
+
+    entity_description: GenericBTMetricSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_should_poll = True
+    _unrecorded_attributes = GenericBTEntity._unrecorded_attributes | {"count", "p50", "p95", "max"}
+
+    def __init__(self, coordinator: GenericBTCoordinator, description: GenericBTMetricSensorEntityDescription) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_unique_id = f"{coordinator.base_unique_id}-metric-{description.key}"
+
+    @property
+    def native_value(self) -> Any:
+        """Return the metric."""
+        return self.entity_description.value_fn(self._device.metrics)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the histogram summary or the failures by cause."""
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self._device.metrics)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        # writing on every advertisement would cost more than the metrics themselves
+        if self.available != self._written_available:
+            self._async_write_throttled_state()
@@ -0,0 +1,71 @@
+"""Persisted last advertisement payload per address."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_ADVERTISEMENT_CACHE, DOMAIN
+
+STORAGE_KEY = f"{DOMAIN}.advertisements"
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+
+@callback
+def async_get_advertisement_cache(hass: HomeAssistant) -> AdvertisementCache:
+    """Return the advertisement cache, creating it on first use."""
+    if (cache := hass.data.get(DATA_ADVERTISEMENT_CACHE)) is None:
+        cache = hass.data[DATA_ADVERTISEMENT_CACHE] = AdvertisementCache(hass)
+    return cache
+
+
+class AdvertisementCache:
+    """Last known raw manufacturer payload per address, saved lazily to disk."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self._store: Store[dict[str, list[Any]]] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._load_lock = asyncio.Lock()
+        self._payloads: dict[str, tuple[int, bytes]] | None = None
+        self._save_scheduled = False
+
+    async def async_load(self) -> None:
+        """Load the cache from disk once."""
+        async with self._load_lock:
+            if self._payloads is None:
+                data = await self._store.async_load() or {}
+                self._payloads = {address: (manufacturer_id, bytes.fromhex(payload)) for address, (manufacturer_id, payload) in data.items()}
+
+    @callback
+    def async_get(self, address: str) -> tuple[int, bytes] | None:
+        """Return the last payload of an address."""
+        return self._payloads.get(address) if self._payloads is not None else None
+
+    @callback
+    def async_set(self, address: str, payload: tuple[int, bytes]) -> None:
+        """Remember the last payload of an address."""
+        if self._payloads is None:
+            return
+        self._payloads[address] = payload
+        self._async_schedule_save()
+
+    @callback
+    def async_remove(self, address: str) -> None:
+        """Forget an address."""
+        if self._payloads is not None and self._payloads.pop(address, None) is not None:
+            self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        # rescheduling on every change would churn timers, the data is collected at save time
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, list[Any]]:
+        self._save_scheduled = False
+        return {address: [manufacturer_id, payload.hex()] for address, (manufacturer_id, payload) in (self._payloads or {}).items()}
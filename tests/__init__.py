@@ -0,0 +1 @@
+"""Tests for the Generic BT integration."""
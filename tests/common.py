@@ -0,0 +1,139 @@
+"""Helpers shared by the Generic BT tests."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak.exc import BleakError
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
+from homeassistant.const import CONF_ADDRESS
+from homeassistant.core import HomeAssistant
+
+from custom_components.generic_bt.const import CONF_MANUFACTURER_ID, DOMAIN
+
+ADDRESS = "AA:BB:CC:DD:EE:FF"
+UUID_1 = "0000ffe1-0000-1000-8000-00805f9b34fb"
+UUID_2 = "0000ffe2-0000-1000-8000-00805f9b34fb"
+# a manufacturer that is not a beacon, entries get the binary sensor and the GATT services
+CONNECTABLE_MANUFACTURER_ID = 7
+# benchmark results by case, shown in the terminal summary
+BENCHMARK_RESULTS = pytest.StashKey[dict[str, dict[str, float]]]()
+
+
+def size_payload(size: int = 10000) -> bytes:
+    """Return a manufacturer 65535 payload with a size reading in hundredths."""
+    return bytes(15) + bytes([0x25, 0]) + size.to_bytes(2, "little") + bytes(3)
+
+
+def make_service_info(
+    payload: bytes,
+    manufacturer_id: int = 65535,
+    address: str = ADDRESS,
+    rssi: int = -60,
+    connectable: bool = True,
+    service_data: dict[str, bytes] | None = None,
+    source: str = "hci0",
+) -> BluetoothServiceInfoBleak:
+    """Return the service info of an advertisement with one manufacturer data item."""
+    manufacturer_data = {manufacturer_id: payload}
+    service_data = service_data or {}
+    return BluetoothServiceInfoBleak(
+        name="tag",
+        address=address,
+        rssi=rssi,
+        manufacturer_data=manufacturer_data,
+        service_data=service_data,
+        service_uuids=list(service_data),
+        source=source,
+        device=BLEDevice(address, "tag", {"source": source}, rssi),
+        advertisement=AdvertisementData("tag", manufacturer_data, service_data, list(service_data), None, rssi, ()),
+        connectable=connectable,
+        time=time.monotonic(),
+    )
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    options: dict[str, Any] | None = None,
+    address: str = ADDRESS,
+    manufacturer_id: int | None = None,
+) -> MockConfigEntry:
+    """Add and set up an entry."""
+    data: dict[str, Any] = {CONF_ADDRESS: address}
+    if manufacturer_id is not None:
+        data[CONF_MANUFACTURER_ID] = manufacturer_id
+    entry = MockConfigEntry(domain=DOMAIN, unique_id=address, data=data, options=options or {}, title="tag")
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
+
+
+class FakeCharacteristic:
+    """A characteristic of a fake connection."""
+
+    def __init__(self, uuid: str, client: FakeBleakClient) -> None:
+        self.uuid = uuid
+        self.client = client
+
+
+class FakeServices:
+    """The service table of a fake connection."""
+
+    def __init__(self, client: FakeBleakClient, uuids: list[str]) -> None:
+        self._characteristics = {uuid: FakeCharacteristic(uuid, client) for uuid in uuids}
+
+    def get_characteristic(self, uuid: str) -> FakeCharacteristic | None:
+        return self._characteristics.get(uuid)
+
+
+class FakeBleakClient:
+    """In-process stand-in for BleakClientWithServiceCache, every operation takes `latency` seconds."""
+
+    def __init__(self, ble_device: Any, uuids: list[str], latency: float = 0.0, disconnected_callback: Any = None) -> None:
+        self.ble_device = ble_device
+        self.latency = latency
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = True
+        self.services = FakeServices(self, uuids)
+        # the value of every characteristic, written ones return what was written
+        self.values: dict[str, bytes] = {uuid: b"\x01\x02" for uuid in uuids}
+        self.writes: list[tuple[str, bytes, bool]] = []
+        self.reads = 0
+        self.notify: dict[str, Any] = {}
+
+    def _check(self, characteristic: FakeCharacteristic) -> None:
+        if characteristic.client is not self or not self.is_connected:
+            raise BleakError(f"Characteristic {characteristic.uuid} does not belong to this connection")
+
+    async def write_gatt_char(self, characteristic: FakeCharacteristic, data: bytes, response: bool = False) -> None:
+        self._check(characteristic)
+        await asyncio.sleep(self.latency)
+        self.values[characteristic.uuid] = bytes(data)
+        self.writes.append((characteristic.uuid, bytes(data), response))
+
+    async def read_gatt_char(self, characteristic: FakeCharacteristic) -> bytearray:
+        self._check(characteristic)
+        await asyncio.sleep(self.latency)
+        self.reads += 1
+        return bytearray(self.values[characteristic.uuid])
+
+    async def start_notify(self, characteristic: FakeCharacteristic, callback: Any) -> None:
+        self._check(characteristic)
+        self.notify[characteristic.uuid] = callback
+
+    async def stop_notify(self, characteristic: FakeCharacteristic) -> None:
+        self.notify.pop(characteristic.uuid, None)
+
+    async def clear_cache(self) -> bool:
+        return True
+
+    async def disconnect(self) -> bool:
+        self.is_connected = False
+        return True
@@ -0,0 +1,120 @@
+"""Fixtures for the Generic BT tests."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Generator
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.components.bluetooth import BluetoothChange, BluetoothServiceInfoBleak
+
+from .common import BENCHMARK_RESULTS, UUID_1, UUID_2, FakeBleakClient
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("generic_bt benchmark")
+    group.addoption("--benchmark", action="store_true", help="run the benchmarks")
+    group.addoption("--benchmark-save", help="write the benchmark results to this file")
+    group.addoption("--benchmark-baseline", help="fail the benchmarks that are slower than the results in this file")
+    group.addoption("--benchmark-tolerance", type=float, default=0.25, help="allowed slowdown against the baseline, 0.25 is 25%%")
+
+
+def pytest_terminal_summary(terminalreporter: pytest.TerminalReporter, exitstatus: int, config: pytest.Config) -> None:
+    """Show the benchmark results."""
+    if not (results := config.stash.get(BENCHMARK_RESULTS, None)):
+        return
+    terminalreporter.write_sep("-", "generic_bt benchmark")
+    for name, result in results.items():
+        terminalreporter.write_line(f"{name:20} {result['throughput']:12.0f}/s  p50 {result['p50_us']:9.1f} us  p99 {result['p99_us']:9.1f} us")
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations: None) -> None:
+    """Enable the integration in every test."""
+
+
+class FakeBluetooth:
+    """The callbacks registered with the bluetooth integration, and the last advertisement of every address."""
+
+    def __init__(self) -> None:
+        self.callbacks: list[tuple[Callable[[BluetoothServiceInfoBleak, BluetoothChange], None], dict[str, Any]]] = []
+        self.last_service_info: dict[str, BluetoothServiceInfoBleak] = {}
+
+    def register(self, hass: Any, callback: Callable, matcher: dict[str, Any], mode: Any) -> Callable[[], None]:
+        registration = (callback, matcher)
+        self.callbacks.append(registration)
+        return lambda: self.callbacks.remove(registration)
+
+    def advertise(self, service_info: BluetoothServiceInfoBleak) -> None:
+        """Deliver an advertisement to the matching callbacks."""
+        self.last_service_info[service_info.address] = service_info
+        for callback, matcher in list(self.callbacks):
+            if "address" in matcher and matcher["address"] != service_info.address:
+                continue
+            if "manufacturer_id" in matcher and matcher["manufacturer_id"] not in service_info.manufacturer_data:
+                continue
+            callback(service_info, BluetoothChange.ADVERTISEMENT)
+
+    def ble_device(self, hass: Any, address: str, connectable: bool = True) -> Any:
+        service_info = self.last_service_info.get(address)
+        return service_info.device if service_info is not None else None
+
+
+@pytest.fixture
+def bluetooth() -> Generator[FakeBluetooth, None, None]:
+    """Replace the bluetooth integration, advertisements are delivered with advertise()."""
+    fake = FakeBluetooth()
+    with (
+        patch("homeassistant.components.bluetooth.async_ble_device_from_address", side_effect=fake.ble_device),
+        patch("homeassistant.components.bluetooth.async_last_service_info", side_effect=lambda hass, address, connectable=True: fake.last_service_info.get(address)),
+        patch("homeassistant.components.bluetooth.async_register_callback", side_effect=fake.register),
+        patch("custom_components.generic_bt.config_flow.async_discovered_service_info", side_effect=lambda hass, connectable=True: list(fake.last_service_info.values())),
+        patch("homeassistant.components.bluetooth.update_coordinator.async_register_callback", side_effect=fake.register, create=True),
+        patch("homeassistant.components.bluetooth.update_coordinator.async_track_unavailable", return_value=lambda: None, create=True),
+        patch("homeassistant.components.bluetooth.update_coordinator.async_address_present", return_value=True, create=True),
+        patch("homeassistant.setup.async_process_deps_reqs"),
+    ):
+        yield fake
+
+
+class FakeBleak:
+    """The connections made by establish_connection."""
+
+    def __init__(self) -> None:
+        self.uuids = [UUID_1, UUID_2]
+        self.latency = 0.0
+        # seconds establish_connection takes
+        self.connect_latency = 0.0
+        self.clients: list[FakeBleakClient] = []
+        # the most connections that were open at once
+        self.peak = 0
+
+    @property
+    def client(self) -> FakeBleakClient:
+        """Return the last connection."""
+        return self.clients[-1]
+
+    @property
+    def connected(self) -> int:
+        """Return the number of open connections."""
+        return sum(client.is_connected for client in self.clients)
+
+    async def establish_connection(self, client_class: Any, ble_device: Any, name: str, disconnected_callback: Any = None, **kwargs: Any) -> FakeBleakClient:
+        client = FakeBleakClient(ble_device, self.uuids, self.latency, disconnected_callback)
+        # the connection is open while it is being set up, an eviction cannot close it
+        self.clients.append(client)
+        self.peak = max(self.peak, self.connected)
+        await asyncio.sleep(self.connect_latency)
+        return client
+
+
+@pytest.fixture
+def bleak() -> Generator[FakeBleak, None, None]:
+    """Replace bleak connections with in-process fakes."""
+    fake = FakeBleak()
+    with patch("custom_components.generic_bt.generic_bt_api.device.establish_connection", side_effect=fake.establish_connection):
+        yield fake
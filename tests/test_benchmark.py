@@ -0,0 +1,155 @@
+"""Benchmarks of the advertisement hot path and of GATT writes, through the real coordinators and entities.
+
+They are skipped unless asked for:
+
+    pytest tests/test_benchmark.py --benchmark --benchmark-save baseline.json
+    pytest tests/test_benchmark.py --benchmark --benchmark-baseline baseline.json
+
+With a baseline a case fails when it lost more than the tolerance in throughput
+or median latency, save one before an upgrade and compare after on the same,
+otherwise idle, machine. Baselines of other settings are not compared.
+"""
+from __future__ import annotations
+
+from collections.abc import Generator
+import json
+import time
+from typing import Any
+
+import pytest
+
+from homeassistant.components.bluetooth import BluetoothChange
+from homeassistant.core import HomeAssistant
+
+from custom_components.generic_bt.const import DOMAIN
+from custom_components.generic_bt.coordinator import GenericBTCoordinator
+
+from .common import BENCHMARK_RESULTS, CONNECTABLE_MANUFACTURER_ID, UUID_1, async_setup_entry, make_service_info, size_payload
+
+ADVERTISEMENTS = 20000
+WRITES = 200
+REPEAT = 5
+# a schema field on the size reading, so the schema decoder runs next to the manufacturer decoder
+BENCHMARK_OPTIONS = {"payload_schema": "65535, size, 17, H, 0.01", "history_size": 64}
+SETTINGS = {"advertisements": ADVERTISEMENTS, "writes": WRITES, "repeat": REPEAT}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _benchmark(request: pytest.FixtureRequest) -> Generator[None, None, None]:
+    """Skip unless --benchmark, save the results of the module when asked to, the terminal summary shows them."""
+    if not request.config.getoption("--benchmark"):
+        pytest.skip("benchmarks run with --benchmark")
+    results = request.config.stash[BENCHMARK_RESULTS] = {}
+    yield
+    if path := request.config.getoption("--benchmark-save"):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"settings": SETTINGS, "results": results}, file, indent=2)
+
+
+def _quantile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _result(operations: int, elapsed: float, latencies: list[float]) -> dict[str, float]:
+    return {
+        "operations": operations,
+        "throughput": operations / elapsed,
+        "p50_us": _quantile(latencies, 0.5) * 1e6,
+        "p99_us": _quantile(latencies, 0.99) * 1e6,
+    }
+
+
+def _best(runs: list[dict[str, float]]) -> dict[str, float]:
+    """Return the best value of every figure, the slower runs were disturbed by something else."""
+    return {
+        "operations": runs[0]["operations"],
+        "throughput": max(result["throughput"] for result in runs),
+        "p50_us": min(result["p50_us"] for result in runs),
+        "p99_us": min(result["p99_us"] for result in runs),
+    }
+
+
+def _check(request: pytest.FixtureRequest, name: str, result: dict[str, float]) -> None:
+    """Keep the result and fail when it is slower than the baseline by more than the tolerance."""
+    request.config.stash[BENCHMARK_RESULTS][name] = result
+    if not (path := request.config.getoption("--benchmark-baseline")):
+        return
+    with open(path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    # numbers are only comparable when the cases did the same work
+    if baseline["settings"] != SETTINGS or (reference := baseline["results"].get(name)) is None:
+        return
+    tolerance = request.config.getoption("--benchmark-tolerance")
+    assert result["throughput"] >= reference["throughput"] * (1 - tolerance), f"throughput {result['throughput']:.0f}/s, baseline {reference['throughput']:.0f}/s"
+    assert result["p50_us"] <= reference["p50_us"] * (1 + tolerance), f"p50 {result['p50_us']:.1f} us, baseline {reference['p50_us']:.1f} us"
+
+
+def _address(index: int) -> str:
+    return f"00:00:00:00:{index >> 8:02X}:{index & 0xFF:02X}"
+
+
+@pytest.mark.parametrize("devices", [1, 100, 1000])
+async def test_fan_out(hass: HomeAssistant, bluetooth, request: pytest.FixtureRequest, devices: int) -> None:
+    """Feed advertisements round robin to the coordinators of a number of entries.
+
+    Every device repeats a payload four times before it changes, so the
+    unchanged path is exercised as often as it is in the field. Changed
+    payloads update the entities and write their state.
+    """
+    coordinators: list[GenericBTCoordinator] = []
+    frames = []
+    for index in range(devices):
+        address = _address(index)
+        bluetooth.advertise(make_service_info(size_payload(100), address=address))
+        entry = await async_setup_entry(hass, BENCHMARK_OPTIONS, address)
+        coordinators.append(hass.data[DOMAIN][entry.entry_id])
+        frames.append([make_service_info(size_payload(size), address=address) for size in (100, 100, 100, 100, 250, 250, 250, 250)])
+
+    def _run() -> dict[str, float]:
+        latencies = [0.0] * ADVERTISEMENTS
+        perf_counter = time.perf_counter
+        started = perf_counter()
+        for index in range(ADVERTISEMENTS):
+            slot = index % devices
+            received = perf_counter()
+            coordinators[slot]._async_handle_bluetooth_event(frames[slot][(index // devices) % 8], BluetoothChange.ADVERTISEMENT)  # pylint: disable=protected-access
+            latencies[index] = perf_counter() - received
+        return _result(ADVERTISEMENTS, perf_counter() - started, latencies)
+
+    # warm up the interpreter and the caches, the first run would be slower otherwise
+    _run()
+    runs = []
+    for _ in range(REPEAT):
+        runs.append(_run())
+        await hass.async_block_till_done()
+    assert hass.states.get("sensor.tag_size").state in ("1.0", "2.5")
+    _check(request, f"fan_out_{devices}", _best(runs))
+
+
+@pytest.mark.parametrize("batched", [False, True], ids=["sequential", "batched"])
+async def test_writes(hass: HomeAssistant, bluetooth, bleak, request: pytest.FixtureRequest, batched: bool) -> None:
+    """Write to a characteristic through the services, one call at a time or in one transaction."""
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    await async_setup_entry(hass)
+    target: dict[str, Any] = {"entity_id": "binary_sensor.tag"}
+    # connect once up front, the cases measure the operations and not the connection
+    await hass.services.async_call(DOMAIN, "write_gatt", {**target, "target_uuid": UUID_1, "data": "00"}, blocking=True)
+
+    async def _run() -> dict[str, float]:
+        latencies: list[float] = []
+        started = time.perf_counter()
+        if batched:
+            steps = [{"operation": "write", "target_uuid": UUID_1, "data": "0102030405"}] * WRITES
+            await hass.services.async_call(DOMAIN, "gatt_transaction", {**target, "steps": steps}, blocking=True, return_response=True)
+            latencies.append((time.perf_counter() - started) / WRITES)
+        else:
+            for _ in range(WRITES):
+                write_started = time.perf_counter()
+                await hass.services.async_call(DOMAIN, "write_gatt", {**target, "target_uuid": UUID_1, "data": "0102030405"}, blocking=True)
+                latencies.append(time.perf_counter() - write_started)
+        return _result(WRITES, time.perf_counter() - started, latencies)
+
+    runs = [await _run() for _ in range(REPEAT)]
+    assert len(bleak.client.writes) == 1 + WRITES * REPEAT
+    _check(request, f"writes_{'batched' if batched else 'sequential'}", _best(runs))
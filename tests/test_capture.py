@@ -0,0 +1,119 @@
+"""Tests for advertisement capture and replay."""
+import pytest
+
+from custom_components.generic_bt.capture import capture_path
+from custom_components.generic_bt.generic_bt_api.capture import MAGIC, CaptureWriter, iter_capture, read_capture
+
+from .common import ADDRESS, async_setup_entry, make_service_info, size_payload
+
+SERVICE_UUID = "0000181a-0000-1000-8000-00805f9b34fb"
+
+
+def _write(path: str, count: int) -> CaptureWriter:
+    writer = CaptureWriter(path)
+    for index in range(count):
+        writer.append(float(index), ADDRESS, -index, {65535: bytes([index]) * 3, 76: b""}, {SERVICE_UUID: bytes([index])} if index else {})
+    writer.write(writer.take())
+    return writer
+
+
+def test_roundtrip(tmp_path) -> None:
+    path = str(tmp_path / "capture.bin")
+    writer = _write(path, 3)
+    assert writer.records == 3 and writer.pending == 0
+
+    records = list(iter_capture(path))
+    assert [(record.timestamp, record.address, record.rssi, record.manufacturer_data, record.service_data) for record in records] == [
+        (0.0, ADDRESS, 0, {65535: b"\x00\x00\x00", 76: b""}, {}),
+        (1.0, ADDRESS, -1, {65535: b"\x01\x01\x01", 76: b""}, {SERVICE_UUID: b"\x01"}),
+        (2.0, ADDRESS, -2, {65535: b"\x02\x02\x02", 76: b""}, {SERVICE_UUID: b"\x02"}),
+    ]
+
+
+def test_read_in_batches(tmp_path) -> None:
+    path = str(tmp_path / "capture.bin")
+    _write(path, 5)
+
+    records, offset = read_capture(path, 0, 2)
+    assert [record.timestamp for record in records] == [0.0, 1.0]
+    records, offset = read_capture(path, offset, 2)
+    assert [record.timestamp for record in records] == [2.0, 3.0]
+    records, offset = read_capture(path, offset)
+    assert [record.timestamp for record in records] == [4.0]
+    assert read_capture(path, offset) == ([], offset)
+
+
+def test_truncated_record_is_left_for_later(tmp_path) -> None:
+    path = str(tmp_path / "capture.bin")
+    writer = CaptureWriter(path)
+    writer.append(1.0, ADDRESS, -60, {65535: b"\x01\x02"}, {})
+    data = writer.take()
+    writer.write(data[:-1])
+
+    records, offset = read_capture(path)
+    assert records == [] and offset == len(MAGIC)
+    # the rest of the record is appended by the next flush
+    writer.write(data[-1:])
+    records, offset = read_capture(path, offset)
+    assert [record.manufacturer_data for record in records] == [{65535: b"\x01\x02"}]
+
+
+def test_not_a_capture(tmp_path) -> None:
+    path = tmp_path / "capture.bin"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        read_capture(str(path))
+
+
+async def test_capture_and_replay(hass, bluetooth, tmp_path) -> None:
+    hass.config.config_dir = str(tmp_path)
+    hass.config.allowlist_external_dirs = {str(tmp_path)}
+    bluetooth.advertise(make_service_info(size_payload(100)))
+    entry = await async_setup_entry(hass, {"capture": True})
+    for size in range(1, 21):
+        bluetooth.advertise(make_service_info(size_payload(size * 100)))
+    await hass.async_block_till_done()
+    # unloading writes the buffered advertisements
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    assert [record.manufacturer_data[65535] for record in iter_capture(capture_path(hass, ADDRESS))][-1] == size_payload(2000)
+
+    hass.config_entries.async_update_entry(entry, options={})
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    bluetooth.advertise(make_service_info(size_payload(100)))
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "1.0"
+
+    response = await hass.services.async_call(
+        "generic_bt", "replay_capture", {"path": capture_path(hass, ADDRESS), "speed": 0}, blocking=True, return_response=True
+    )
+    assert response == {"replayed": 20}
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "20.0"
+
+
+async def test_replay_while_capturing(hass, bluetooth, tmp_path) -> None:
+    """Replayed advertisements are not captured again, the replay ends and service data fields are replayed."""
+    hass.config.config_dir = str(tmp_path)
+    hass.config.allowlist_external_dirs = {str(tmp_path)}
+    bluetooth.advertise(make_service_info(size_payload(100)))
+    entry = await async_setup_entry(hass, {"capture": True, "payload_schema": f"{SERVICE_UUID}, temperature, 0, h, 0.1"})
+    for temperature in range(1, 11):
+        bluetooth.advertise(make_service_info(size_payload(100), service_data={SERVICE_UUID: (temperature * 10).to_bytes(2, "little")}))
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.tag_temperature").state == "10.0"
+    coordinator = hass.data["generic_bt"][entry.entry_id]
+    await coordinator.capture.async_stop()
+    path = capture_path(hass, ADDRESS)
+    captured = len(list(iter_capture(path)))
+    bluetooth.advertise(make_service_info(size_payload(100), service_data={SERVICE_UUID: b"\x00\x00"}))
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.tag_temperature").state == "0.0"
+
+    response = await hass.services.async_call("generic_bt", "replay_capture", {"path": path, "speed": 0}, blocking=True, return_response=True)
+
+    assert response == {"replayed": captured}
+    assert hass.states.get("sensor.tag_temperature").state == "10.0"
+    await coordinator.capture.async_stop()
+    assert len(list(iter_capture(path))) == captured + 1
+    assert await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,110 @@
+"""Tests for the Generic BT config flow."""
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant import config_entries
+from homeassistant.const import CONF_ADDRESS
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.generic_bt.const import CONF_HUB_MODE, CONF_KEEP_WARM, CONF_PAYLOAD_SCHEMA, DOMAIN
+
+from .common import CONNECTABLE_MANUFACTURER_ID, make_service_info, size_payload
+
+TAGS = [f"AA:BB:CC:DD:00:{index:02X}" for index in range(5)]
+LOCK = "AA:BB:CC:DD:01:00"
+
+
+def _advertise(bluetooth) -> None:
+    for address in TAGS:
+        bluetooth.advertise(make_service_info(size_payload(), address=address))
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID, LOCK))
+
+
+def _default(result, key: str):
+    return next(marker.default() for marker in result["data_schema"].schema if marker == key)
+
+
+async def test_bulk_onboarding_uses_hub_mode(hass, bluetooth) -> None:
+    _advertise(bluetooth)
+    with patch("custom_components.generic_bt.async_setup_entry", return_value=True):
+        result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+        assert result["step_id"] == "user"
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"manufacturer_id": "65535", "name_pattern": "nomatch*"})
+        assert result["errors"] == {"base": "no_matching_devices"}
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"manufacturer_id": "65535", "name_pattern": "TA*"})
+        assert result["step_id"] == "select"
+        assert _default(result, CONF_HUB_MODE) is True
+
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"addresses": TAGS[:4]})
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        await hass.async_block_till_done()
+
+    entries = hass.config_entries.async_entries(DOMAIN)
+    assert sorted(entry.unique_id for entry in entries) == TAGS[:4]
+    assert all(entry.data["manufacturer_id"] == 65535 and entry.options == {CONF_HUB_MODE: True} for entry in entries)
+    # the other devices were confirmed in the select step, they are not offered as discoveries
+    assert all(entry.source == config_entries.SOURCE_USER for entry in entries)
+    assert hass.config_entries.flow.async_progress() == []
+
+
+async def test_bulk_selection_skips_configured_devices(hass, bluetooth) -> None:
+    _advertise(bluetooth)
+    with patch("custom_components.generic_bt.async_setup_entry", return_value=True):
+        result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"manufacturer_id": "65535"})
+        # another flow adds one of the picked devices in the meantime
+        MockConfigEntry(domain=DOMAIN, unique_id=TAGS[2], data={CONF_ADDRESS: TAGS[2]}).add_to_hass(hass)
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"addresses": TAGS[:3]})
+        await hass.async_block_till_done()
+
+    assert len(hass.config_entries.async_entries(DOMAIN)) == 3
+    assert hass.config_entries.flow.async_progress() == []
+
+
+async def test_hub_mode_can_be_turned_off(hass, bluetooth) -> None:
+    _advertise(bluetooth)
+    with patch("custom_components.generic_bt.async_setup_entry", return_value=True):
+        result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {})
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"addresses": TAGS[:2], CONF_HUB_MODE: False})
+        await hass.async_block_till_done()
+
+    assert [entry.options for entry in hass.config_entries.async_entries(DOMAIN)] == [{CONF_HUB_MODE: False}] * 2
+
+
+async def test_bluetooth_discovery(hass, bluetooth) -> None:
+    _advertise(bluetooth)
+    with patch("custom_components.generic_bt.async_setup_entry", return_value=True):
+        # a single beacon still shares the callbacks, a connectable device gets its own
+        result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_BLUETOOTH}, data=bluetooth.last_service_info[TAGS[0]])
+        assert result["step_id"] == "select"
+        assert _default(result, CONF_HUB_MODE) is True
+        result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_BLUETOOTH}, data=bluetooth.last_service_info[LOCK])
+        assert _default(result, CONF_HUB_MODE) is False
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {"addresses": []})
+        assert result["errors"] == {"base": "no_devices_selected"}
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], {})
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        assert result["result"].options == {CONF_HUB_MODE: False}
+
+
+async def test_options_flow(hass, bluetooth) -> None:
+    _advertise(bluetooth)
+    entry = MockConfigEntry(domain=DOMAIN, unique_id=TAGS[0], data={CONF_ADDRESS: TAGS[0]}, options={CONF_HUB_MODE: True}, title="tag")
+    entry.add_to_hass(hass)
+    with patch("custom_components.generic_bt.async_setup_entry", return_value=True):
+        result = await hass.config_entries.options.async_init(entry.entry_id)
+        assert result["step_id"] == "init"
+        assert _default(result, CONF_HUB_MODE) is True
+        result = await hass.config_entries.options.async_configure(result["flow_id"], {CONF_PAYLOAD_SCHEMA: "65535, size, 17, X"})
+        assert result["errors"] == {CONF_PAYLOAD_SCHEMA: "invalid_schema"}
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"], {CONF_HUB_MODE: False, CONF_KEEP_WARM: True, CONF_PAYLOAD_SCHEMA: "65535, size, 17, H, 0.01"}
+        )
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        await hass.async_block_till_done()
+
+    assert entry.options[CONF_HUB_MODE] is False
+    assert entry.options[CONF_KEEP_WARM] is True
+    assert entry.options[CONF_PAYLOAD_SCHEMA] == "65535, size, 17, H, 0.01"
@@ -0,0 +1,130 @@
+"""Tests for the connection slots."""
+import asyncio
+from unittest.mock import patch
+
+from bleak.backends.device import BLEDevice
+import pytest
+
+from custom_components.generic_bt.const import CONF_KEEP_WARM
+from custom_components.generic_bt.generic_bt_api import device as device_module
+from custom_components.generic_bt.generic_bt_api.connection import ConnectionManager
+from custom_components.generic_bt.generic_bt_api.device import GenericBTDevice
+from custom_components.generic_bt.generic_bt_api.exceptions import GenericBTTimeout
+
+from .common import CONNECTABLE_MANUFACTURER_ID, UUID_1, async_setup_entry, make_service_info
+
+
+def _device(index: int, manager: ConnectionManager) -> GenericBTDevice:
+    address = f"00:00:00:00:00:{index:02X}"
+    return GenericBTDevice(BLEDevice(address, None, None, -60), address, connection_manager=manager)
+
+
+async def test_connecting_device_is_not_evicted(bleak) -> None:
+    """A device that took a slot and is still connecting keeps it, the cap holds."""
+    bleak.connect_latency = 0.01
+    manager = ConnectionManager(max_connections_per_adapter=2)
+    devices = [_device(index, manager) for index in range(6)]
+
+    await asyncio.gather(*(device.write_gatt(UUID_1, "01") for device in devices))
+
+    assert bleak.peak == 2
+    assert all(client.writes == [(UUID_1, b"\x01", True)] for client in bleak.clients)
+    assert len(bleak.clients) == 6
+    assert bleak.connected == manager.as_dict()["adapters"]["None"]["in_use"]
+    for device in devices:
+        await device.stop()
+    assert bleak.connected == 0
+
+
+async def test_idle_device_is_evicted(bleak) -> None:
+    manager = ConnectionManager(max_connections_per_adapter=1)
+    first, second = _device(1, manager), _device(2, manager)
+
+    await first.write_gatt(UUID_1, "01")
+    assert first.connected and first.evictable
+    # the idle connection makes room right away, the idle timeout has not passed
+    await second.write_gatt(UUID_1, "02")
+
+    assert not first.connected and second.connected
+    assert bleak.peak == 1
+    await second.stop()
+
+
+async def test_connect_attempts_are_cut_off(bleak) -> None:
+    """A hanging connect is abandoned after the attempt timeout and the next attempt follows."""
+    bleak.connect_latency = 60
+    device = _device(1, ConnectionManager())
+    with (
+        patch.object(device_module, "CONNECT_ATTEMPT_TIMEOUT", 0.02),
+        patch.object(device_module, "CONNECT_BACKOFF", 0.01),
+        pytest.raises(GenericBTTimeout),
+    ):
+        await device.write_gatt(UUID_1, "01")
+
+    assert device.metrics.connect_failures == {"TimeoutError": 3}
+    assert not device.connected
+    await device.stop()
+
+
+async def test_connect_stops_at_the_overall_timeout(bleak) -> None:
+    bleak.connect_latency = 60
+    device = _device(1, ConnectionManager())
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with (
+        patch.object(device_module, "CONNECT_ATTEMPT_TIMEOUT", 0.05),
+        patch.object(device_module, "CONNECT_BACKOFF", 0.01),
+        patch.object(device_module, "CONNECT_TIMEOUT", 0.08),
+        pytest.raises(GenericBTTimeout),
+    ):
+        await device.write_gatt(UUID_1, "01")
+
+    # the second attempt only got what was left of the overall timeout, there was no third
+    assert loop.time() - started < 0.15
+    assert device.metrics.connect_failures == {"TimeoutError": 2}
+    await device.stop()
+
+
+async def test_waiting_for_a_slot_counts_against_the_attempt(bleak) -> None:
+    manager = ConnectionManager(max_connections_per_adapter=1)
+    holder, waiter = _device(1, manager), _device(2, manager)
+    holder.keep_warm = True
+    await holder.write_gatt(UUID_1, "01")
+
+    with (
+        patch.object(device_module, "CONNECT_ATTEMPT_TIMEOUT", 0.05),
+        patch.object(device_module, "CONNECT_TIMEOUT", 0.2),
+        pytest.raises(GenericBTTimeout),
+    ):
+        await waiter.write_gatt(UUID_1, "02")
+
+    # the slot wait was abandoned cleanly, the slot is still the holder's
+    assert manager.as_dict()["adapters"]["None"] == {"in_use": 1, "waiting": 0, "devices": [holder.address]}
+    assert len(bleak.clients) == 1
+    await holder.stop()
+    await waiter.stop()
+
+
+async def test_keep_warm_connects_when_the_device_is_heard(hass, bluetooth, bleak) -> None:
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    entry = await async_setup_entry(hass, {CONF_KEEP_WARM: True})
+    assert bleak.clients == []
+
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    await hass.async_block_till_done()
+    assert bleak.connected == 1
+
+    # later advertisements reuse the connection
+    bluetooth.advertise(make_service_info(b"\x01\x03", CONNECTABLE_MANUFACTURER_ID))
+    await hass.async_block_till_done()
+    assert len(bleak.clients) == 1
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    assert bleak.connected == 0
+
+
+async def test_devices_are_not_warmed_up_by_default(hass, bluetooth, bleak) -> None:
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    await async_setup_entry(hass)
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    await hass.async_block_till_done()
+    assert bleak.clients == []
@@ -0,0 +1,38 @@
+"""Tests for the Generic BT coordinator."""
+from custom_components.generic_bt.const import DOMAIN
+
+from .common import async_setup_entry, make_service_info, size_payload
+
+
+async def test_unchanged_payloads_are_suppressed(hass, bluetooth) -> None:
+    bluetooth.advertise(make_service_info(size_payload(100)))
+    entry = await async_setup_entry(hass)
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    metrics = coordinator.device.metrics
+
+    for size in (100, 100, 250, 250, 250):
+        bluetooth.advertise(make_service_info(size_payload(size)))
+    await hass.async_block_till_done()
+
+    # the first advertisement is forwarded even though setup already decoded it, the device was unavailable until then
+    assert (metrics.received.count, metrics.forwarded.count, metrics.suppressed.count, metrics.decoded.count) == (5, 2, 3, 1)
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "2.5"
+
+
+async def test_coming_back_forwards_an_unchanged_payload(hass, bluetooth) -> None:
+    service_info = make_service_info(size_payload(100))
+    bluetooth.advertise(service_info)
+    entry = await async_setup_entry(hass)
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    metrics = coordinator.device.metrics
+    bluetooth.advertise(service_info)
+    forwarded = metrics.forwarded.count
+
+    coordinator._async_handle_unavailable(service_info)  # pylint: disable=protected-access
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "unavailable"
+
+    bluetooth.advertise(service_info)
+    await hass.async_block_till_done()
+    assert metrics.forwarded.count == forwarded + 1
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "1.0"
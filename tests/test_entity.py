@@ -0,0 +1,33 @@
+"""Tests for the Generic BT entities."""
+from .common import CONNECTABLE_MANUFACTURER_ID, async_setup_entry, make_service_info, size_payload
+
+
+async def test_beacon_sensor(hass, bluetooth) -> None:
+    bluetooth.advertise(make_service_info(size_payload(1234)))
+    await async_setup_entry(hass)
+
+    state = hass.states.get("sensor.tag_manufacturer_data")
+    assert state.state == "12.34"
+    assert state.attributes["size"] == 12.34
+
+
+async def test_raw_payload_is_not_recorded(hass, bluetooth) -> None:
+    """The hex payload has the same attribute name whatever the manufacturer ID is, and is kept out of the recorder."""
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    await async_setup_entry(hass)
+
+    state = hass.states.get("binary_sensor.tag")
+    assert state.attributes["raw_payload"] == "0102"
+    assert state.attributes["manufacturer_id"] == CONNECTABLE_MANUFACTURER_ID
+    assert CONNECTABLE_MANUFACTURER_ID not in state.attributes
+    assert {"raw_payload", "device_address"} <= state.state_info["unrecorded_attributes"]
+
+
+async def test_header_is_stripped(hass, bluetooth) -> None:
+    bluetooth.advertise(make_service_info(bytes(6) + b"\xab\xcd", 1076))
+    await async_setup_entry(hass)
+
+    state = hass.states.get("sensor.tag_manufacturer_data")
+    assert state.state == "abcd"
+    assert state.attributes["raw_payload"] == "abcd"
+    assert "raw_payload" in state.state_info["unrecorded_attributes"]
@@ -0,0 +1,66 @@
+"""Tests for GATT operations."""
+from bleak.backends.device import BLEDevice
+import pytest
+
+from custom_components.generic_bt.generic_bt_api.device import GenericBTDevice
+from custom_components.generic_bt.generic_bt_api.exceptions import GenericBTCharacteristicNotFound
+
+from .common import ADDRESS, UUID_1, UUID_2
+
+
+def _device() -> GenericBTDevice:
+    return GenericBTDevice(BLEDevice(ADDRESS, None, None, -60), ADDRESS)
+
+
+async def test_new_connection_uses_its_own_characteristics(bleak) -> None:
+    device = _device()
+    await device.write_gatt(UUID_1, "01")
+    first = bleak.client
+    # the device drops the connection, characteristics of the old one are not valid on the next
+    first.is_connected = False
+    first.disconnected_callback(first)
+
+    await device.write_gatt(UUID_1, "02")
+
+    assert bleak.client is not first
+    assert bleak.client.writes == [(UUID_1, b"\x02", True)]
+    await device.stop()
+
+
+async def test_missing_characteristic_is_retried_on_a_new_connection(bleak) -> None:
+    """A characteristic missing from a cached service table is looked up again after discovery."""
+    bleak.uuids = [UUID_1]
+    device = _device()
+    await device.write_gatt(UUID_1, "01")
+    # the firmware was updated, the stack still has the old service table
+    bleak.uuids = [UUID_1, UUID_2]
+
+    await device.write_gatt(UUID_2, "02")
+
+    assert len(bleak.clients) == 2
+    assert not bleak.clients[0].is_connected
+    assert bleak.client.writes == [(UUID_2, b"\x02", True)]
+    await device.stop()
+
+
+async def test_missing_characteristic_fails_after_one_retry(bleak) -> None:
+    bleak.uuids = [UUID_1]
+    device = _device()
+
+    with pytest.raises(GenericBTCharacteristicNotFound):
+        await device.gatt_transaction([("write", UUID_1, "01"), ("read", UUID_2, None)])
+
+    assert len(bleak.clients) == 2
+    # nothing was written, the missing characteristic was found before the first step
+    assert all(not client.writes for client in bleak.clients)
+    await device.stop()
+
+
+async def test_transaction(bleak) -> None:
+    device = _device()
+    reads = await device.gatt_transaction([("write", UUID_1, "0a0b"), ("read", UUID_1, None), ("write_without_response", UUID_2, "ff")])
+
+    assert reads == [(UUID_1, bytearray(b"\x0a\x0b"))]
+    assert bleak.client.writes == [(UUID_1, b"\x0a\x0b", True), (UUID_2, b"\xff", False)]
+    assert len(bleak.clients) == 1
+    await device.stop()
@@ -0,0 +1,49 @@
+"""Tests for the advertisement history."""
+import pytest
+
+from custom_components.generic_bt.const import DOMAIN
+from custom_components.generic_bt.generic_bt_api.history import AdvertisementHistory
+
+from .common import async_setup_entry, make_service_info, size_payload
+
+
+def test_rolling_statistics_after_wraparound() -> None:
+    history = AdvertisementHistory(4)
+    for second, rssi, size in [(0, -90, 9.0), (1, -80, 9.0), (2, -60, 1.0), (4, -70, 2.0), (6, -60, 3.0), (8, -70, 4.0)]:
+        history.record(second, rssi, {"size": size, "raw_payload": "00", "flag": True, 1076: 1.0})
+
+    # the two oldest advertisements were overwritten
+    assert history.as_dict()["timestamps"] == [2, 4, 6, 8]
+    assert history.as_dict()["rssi"] == [-60, -70, -60, -70]
+    assert history.stats() == {
+        "advertisement_rate": 0.5,
+        "rssi_mean": -65.0,
+        "rssi_variance": 25.0,
+        "size_mean": 2.5,
+    }
+    # only numeric values with a name are kept
+    assert list(history.values) == ["size"]
+
+
+def test_rate_needs_two_advertisements() -> None:
+    history = AdvertisementHistory(4)
+    assert history.rate is None
+    history.record(1.0, None)
+    assert history.rate is None
+    assert history.stats()["rssi_mean"] is None
+
+
+async def test_advertisement_rate_sensor(hass, bluetooth) -> None:
+    bluetooth.advertise(make_service_info(size_payload(100)))
+    entry = await async_setup_entry(hass, {"history_size": 3})
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    for size in (100, 200, 300, 400):
+        service_info = make_service_info(size_payload(size))
+        service_info.time = float(size)
+        bluetooth.advertise(service_info)
+    await hass.async_block_till_done()
+    assert coordinator.device.history.timestamps.count == 3
+
+    state = hass.states.get("sensor.tag_advertisement_rate")
+    assert float(state.state) == pytest.approx(0.01)
+    assert state.attributes["size_mean"] == pytest.approx(3.0)
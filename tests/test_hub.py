@@ -0,0 +1,73 @@
+"""Tests for the Generic BT hub mode."""
+from datetime import timedelta
+import time
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.util import dt as dt_util
+
+from custom_components.generic_bt.const import CONF_HUB_MODE, DATA_HUB, UNAVAILABLE_SECONDS
+
+from .common import async_setup_entry, make_service_info, size_payload
+
+TAGS = ["AA:BB:CC:DD:00:01", "AA:BB:CC:DD:00:02"]
+HUB_OPTIONS = {CONF_HUB_MODE: True}
+
+
+async def _async_setup_tags(hass, bluetooth) -> list:
+    entries = []
+    for address in TAGS:
+        bluetooth.advertise(make_service_info(size_payload(100), address=address))
+        entries.append(await async_setup_entry(hass, HUB_OPTIONS, address))
+    return entries
+
+
+def _sizes(hass) -> list[str]:
+    return [hass.states.get(entity_id).state for entity_id in ("sensor.tag_manufacturer_data", "sensor.tag_manufacturer_data_2")]
+
+
+async def test_one_callback_dispatches_by_address(hass, bluetooth) -> None:
+    await _async_setup_tags(hass, bluetooth)
+    assert [matcher for _, matcher in bluetooth.callbacks] == [{"manufacturer_id": 65535, "connectable": False}]
+
+    hub = hass.data[DATA_HUB]
+    received, ignored = hub.received.count, hub.ignored.count
+    bluetooth.advertise(make_service_info(size_payload(250), address=TAGS[1]))
+    await hass.async_block_till_done()
+    assert _sizes(hass) == ["1.0", "2.5"]
+
+    # devices that are not configured are heard and ignored
+    bluetooth.advertise(make_service_info(size_payload(300), address="AA:BB:CC:DD:00:03"))
+    await hass.async_block_till_done()
+    assert (hub.received.count - received, hub.ignored.count - ignored) == (2, 1)
+    assert _sizes(hass) == ["1.0", "2.5"]
+
+
+async def test_sweep_marks_silent_devices_unavailable(hass, bluetooth) -> None:
+    await _async_setup_tags(hass, bluetooth)
+    bluetooth.advertise(make_service_info(size_payload(100), address=TAGS[0]))
+    later = time.monotonic() + UNAVAILABLE_SECONDS + 1
+    # only the second device is heard again
+    service_info = make_service_info(size_payload(300), address=TAGS[1])
+    service_info.time = later
+    bluetooth.advertise(service_info)
+
+    with patch("custom_components.generic_bt.hub.monotonic_time_coarse", return_value=later):
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=31))
+        await hass.async_block_till_done()
+
+    assert _sizes(hass) == [STATE_UNAVAILABLE, "3.0"]
+
+
+async def test_unload_removes_the_callback(hass, bluetooth) -> None:
+    first, second = await _async_setup_tags(hass, bluetooth)
+
+    assert await hass.config_entries.async_unload(first.entry_id)
+    assert len(bluetooth.callbacks) == 1
+    assert list(hass.data[DATA_HUB].coordinators) == [TAGS[1]]
+
+    assert await hass.config_entries.async_unload(second.entry_id)
+    assert bluetooth.callbacks == []
+    assert DATA_HUB not in hass.data
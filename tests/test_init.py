@@ -0,0 +1,105 @@
+"""Tests for the Generic BT entry setup."""
+from datetime import timedelta
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
+
+from homeassistant.components.bluetooth import BluetoothScanningMode
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_ADDRESS
+from homeassistant.util import dt as dt_util
+
+from custom_components.generic_bt import _is_passive
+from custom_components.generic_bt.const import (
+    CONF_MANUFACTURER_ID,
+    CONF_SCAN_MODE,
+    DOMAIN,
+    SCAN_MODE_ACTIVE,
+    SCAN_MODE_AUTO,
+    SCAN_MODE_PASSIVE,
+)
+from custom_components.generic_bt.storage import STORAGE_KEY, STORAGE_VERSION
+
+from .common import ADDRESS, CONNECTABLE_MANUFACTURER_ID, async_setup_entry, make_service_info, size_payload
+
+
+def _add_entry(hass) -> MockConfigEntry:
+    """Add an entry created before the manufacturer ID was stored."""
+    entry = MockConfigEntry(domain=DOMAIN, unique_id=ADDRESS, data={CONF_ADDRESS: ADDRESS}, title="tag")
+    entry.add_to_hass(hass)
+    return entry
+
+
+async def test_unknown_manufacturer_waits_for_an_advertisement(hass, bluetooth) -> None:
+    entry = _add_entry(hass)
+    assert not await hass.config_entries.async_setup(entry.entry_id)
+    assert entry.state is ConfigEntryState.SETUP_RETRY
+    assert hass.states.get("binary_sensor.tag") is None
+
+    bluetooth.advertise(make_service_info(size_payload(1234)))
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(minutes=5))
+    await hass.async_block_till_done()
+
+    assert entry.state is ConfigEntryState.LOADED
+    assert entry.data[CONF_MANUFACTURER_ID] == 65535
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "12.34"
+    # a beacon is passive, there is nothing to connect to
+    assert hass.states.get("binary_sensor.tag") is None
+
+
+async def test_restore_from_the_cache(hass, hass_storage, bluetooth) -> None:
+    hass_storage[STORAGE_KEY] = {"version": STORAGE_VERSION, "key": STORAGE_KEY, "data": {ADDRESS: [65535, size_payload(1234).hex()]}}
+    entry = _add_entry(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert entry.data[CONF_MANUFACTURER_ID] == 65535
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "12.34"
+    assert hass.states.get("binary_sensor.tag") is None
+
+
+@pytest.mark.parametrize(
+    ("scan_mode", "manufacturer_id", "passive"),
+    [
+        (SCAN_MODE_AUTO, 65535, True),
+        (SCAN_MODE_AUTO, 1076, True),
+        (SCAN_MODE_AUTO, CONNECTABLE_MANUFACTURER_ID, False),
+        (SCAN_MODE_AUTO, None, False),
+        (SCAN_MODE_ACTIVE, 65535, False),
+        (SCAN_MODE_PASSIVE, CONNECTABLE_MANUFACTURER_ID, True),
+    ],
+)
+def test_is_passive(scan_mode: str, manufacturer_id: int | None, passive: bool) -> None:
+    assert _is_passive(scan_mode, manufacturer_id) is passive
+
+
+async def test_auto_scan_mode_listens_passively_to_beacons(hass, bluetooth, bleak) -> None:
+    bluetooth.advertise(make_service_info(size_payload(1234)))
+    entry = await async_setup_entry(hass)
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    assert not coordinator.connectable
+    assert coordinator.mode is BluetoothScanningMode.PASSIVE
+    assert coordinator.device.connected is False
+    # nothing to connect to, no binary sensor and its GATT services
+    assert hass.states.get("binary_sensor.tag") is None
+    assert hass.states.get("sensor.tag_manufacturer_data").state == "12.34"
+    assert bleak.clients == []
+
+
+async def test_auto_scan_mode_connects_to_other_devices(hass, bluetooth) -> None:
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    entry = await async_setup_entry(hass)
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+
+    assert coordinator.connectable
+    assert coordinator.mode is BluetoothScanningMode.ACTIVE
+    assert hass.states.get("binary_sensor.tag") is not None
+
+
+async def test_passive_scan_mode_skips_the_binary_sensor(hass, bluetooth) -> None:
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    entry = await async_setup_entry(hass, {CONF_SCAN_MODE: SCAN_MODE_PASSIVE})
+
+    assert not hass.data[DOMAIN][entry.entry_id].connectable
+    assert hass.states.get("binary_sensor.tag") is None
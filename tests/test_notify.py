@@ -0,0 +1,51 @@
+"""Tests for the GATT notification subscriptions."""
+import asyncio
+
+from homeassistant.const import EVENT_STATE_CHANGED
+
+from custom_components.generic_bt.const import DOMAIN
+from custom_components.generic_bt.generic_bt_api.notify import NotifySubscription
+
+from .common import CONNECTABLE_MANUFACTURER_ID, UUID_1, async_setup_entry, make_service_info
+
+NOTIFY_SENSOR = f"sensor.tag_notify_{UUID_1.replace('-', '_')}"
+
+
+def test_aggregates_over_the_buffer() -> None:
+    subscription = NotifySubscription(UUID_1, "<h", 1, 0.5, 3, 1.0)
+    for value in (10, 20, -30, 40, 50):
+        subscription.handle_notification(None, bytearray(b"\xff" + value.to_bytes(2, "little", signed=True)))
+    # too short for the offset and the format
+    subscription.handle_notification(None, bytearray(b"\xff\x01"))
+
+    # the oldest values were overwritten, the aggregates cover the last three
+    assert subscription.aggregates() == {"last": 25.0, "min": -15.0, "max": 25.0, "mean": 10.0, "samples": 3}
+    assert (subscription.received, subscription.dropped) == (6, 1)
+
+
+async def test_sensor_writes_at_most_max_rate(hass, bluetooth, bleak) -> None:
+    bluetooth.advertise(make_service_info(b"\x01\x02", CONNECTABLE_MANUFACTURER_ID))
+    await async_setup_entry(hass)
+    await hass.services.async_call(
+        DOMAIN, "subscribe_notify", {"entity_id": "binary_sensor.tag", "target_uuid": UUID_1, "format": "<B", "max_rate": 10}, blocking=True
+    )
+    await hass.async_block_till_done()
+    assert hass.states.get(NOTIFY_SENSOR).state == "unknown"
+    # past the interval of the write of the new sensor
+    await asyncio.sleep(0.15)
+    writes: list[str] = []
+    hass.bus.async_listen(EVENT_STATE_CHANGED, lambda event: writes.append(event.data["new_state"].state) if event.data["entity_id"] == NOTIFY_SENSOR else None)
+
+    notify = bleak.client.notify[UUID_1]
+    for value in range(1, 6):
+        notify(None, bytearray([value]))
+    await hass.async_block_till_done()
+    # the first value is written right away, the others wait for the interval
+    assert writes == ["1.0"]
+
+    await asyncio.sleep(0.15)
+    await hass.async_block_till_done()
+    # only the latest value is written once the interval is over
+    assert writes == ["1.0", "5.0"]
+    state = hass.states.get(NOTIFY_SENSOR)
+    assert (state.attributes["min"], state.attributes["max"], state.attributes["mean"], state.attributes["samples"]) == (1.0, 5.0, 3.0, 5)
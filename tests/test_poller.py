@@ -0,0 +1,83 @@
+"""Tests for the shared poll scheduler."""
+import asyncio
+import logging
+from unittest.mock import patch
+
+from custom_components.generic_bt.generic_bt_api.const import POLL_BACKOFF_FACTOR, POLL_MAX_FACTOR
+from custom_components.generic_bt.generic_bt_api.poller import PollScheduler, _PollTarget
+
+
+class _Polls:
+    """Polls that record when and on which target they started."""
+
+    def __init__(self) -> None:
+        self.started: list[tuple[str, float]] = []
+        self.changed = False
+
+    def poll(self, name: str):
+        async def _poll() -> bool:
+            self.started.append((name, asyncio.get_running_loop().time()))
+            return self.changed
+
+        return _poll
+
+    def times(self, name: str) -> list[float]:
+        return [started for polled, started in self.started if polled == name]
+
+
+def test_backoff_while_unchanged() -> None:
+    target = _PollTarget("tag", _Polls().poll("tag"), lambda: None, 10.0)
+    target.adapt(False)
+    assert target.current_interval == 10.0 * POLL_BACKOFF_FACTOR == 15.0
+    target.adapt(False)
+    assert target.current_interval == 22.5
+    for _ in range(10):
+        target.adapt(False)
+    assert target.current_interval == 10.0 * POLL_MAX_FACTOR
+    # a change goes back to the configured interval
+    target.adapt(True)
+    assert target.current_interval == 10.0
+
+
+async def test_jitter() -> None:
+    scheduler = PollScheduler(spacing=0, jitter=0.1)
+    polls = _Polls()
+    polls.changed = True
+    with patch("custom_components.generic_bt.generic_bt_api.poller.random.uniform", side_effect=lambda low, high: low) as uniform:
+        remove = scheduler.add("tag", polls.poll("tag"), 0.05)
+        await asyncio.sleep(0.12)
+        remove()
+
+    # the first poll anywhere in the first interval, the next ones within the jitter around it
+    assert uniform.call_args_list[0].args == (0, 0.05)
+    assert all(call.args == (0.05 * 0.9, 0.05 * 1.1) for call in uniform.call_args_list[1:])
+    assert len(polls.times("tag")) >= 2
+
+
+async def test_spacing_per_adapter(caplog) -> None:
+    scheduler = PollScheduler(spacing=0.05, jitter=0)
+    polls = _Polls()
+    # changed values keep the configured interval
+    polls.changed = True
+    removes = [
+        scheduler.add("first", polls.poll("first"), 0.06, lambda: "hci0"),
+        scheduler.add("second", polls.poll("second"), 0.06, lambda: "hci0"),
+        scheduler.add("other", polls.poll("other"), 0.06, lambda: "hci1"),
+    ]
+    with caplog.at_level(logging.WARNING):
+        await asyncio.sleep(0.3)
+    diagnostics = scheduler.as_dict()
+    for remove in removes:
+        remove()
+
+    shared = sorted(polls.times("first") + polls.times("second"))
+    assert all(later - earlier >= 0.045 for earlier, later in zip(shared, shared[1:]))
+    # the other adapter is not held back
+    assert len(polls.times("other")) > max(len(polls.times("first")), len(polls.times("second")))
+    assert diagnostics["first"]["min_interval"] == 0.1
+    assert diagnostics["other"]["min_interval"] == 0.05
+    assert diagnostics["first"]["deferred"] + diagnostics["second"]["deferred"] > 0
+    # the devices that cannot be polled as often as configured are logged once
+    warned = [record.message for record in caplog.records if "Polled every" in record.message]
+    assert 1 <= len(warned) <= 2
+    assert not any(message.startswith("other") for message in warned)
@@ -0,0 +1,95 @@
+"""Tests for the GATT read cache."""
+import asyncio
+
+from bleak.backends.device import BLEDevice
+import pytest
+
+from custom_components.generic_bt.generic_bt_api.device import GenericBTDevice
+from custom_components.generic_bt.generic_bt_api.read_cache import ReadCache, parse_ttl_list
+
+from .common import ADDRESS, UUID_1, UUID_2
+
+
+def _device(ttl: float = 60) -> GenericBTDevice:
+    return GenericBTDevice(BLEDevice(ADDRESS, None, None, -60), ADDRESS, read_ttls={UUID_1: ttl})
+
+
+def test_parse_ttl_list() -> None:
+    assert parse_ttl_list(f"{UUID_1.upper()}=5\n, {UUID_2} = 0.5,") == {UUID_1: 5.0, UUID_2: 0.5}
+    with pytest.raises(ValueError):
+        parse_ttl_list(UUID_1)
+    with pytest.raises(ValueError):
+        parse_ttl_list(f"{UUID_1}=-1")
+
+
+async def test_read_is_cached_within_ttl(bleak) -> None:
+    device = _device()
+    assert await device.read_gatt(UUID_1) == b"\x01\x02"
+    assert await device.read_gatt(UUID_1) == b"\x01\x02"
+    # characteristics without a TTL are always read
+    await device.read_gatt(UUID_2)
+    await device.read_gatt(UUID_2)
+    assert bleak.client.reads == 3
+    assert device.read_cache.as_dict()["hits"] == 1
+    await device.stop()
+
+
+async def test_write_invalidates_the_cached_value(bleak) -> None:
+    device = _device()
+    assert await device.read_gatt(UUID_1) == b"\x01\x02"
+    await device.write_gatt(UUID_1, "ff")
+    assert await device.read_gatt(UUID_1) == b"\xff"
+    await device.stop()
+
+
+async def test_write_right_after_a_read_is_not_undone(bleak) -> None:
+    """The read completing does not cache its value again after the write invalidated it."""
+    device = _device()
+    read = asyncio.ensure_future(device.read_gatt(UUID_1))
+    # the write is queued behind the read and runs before the reader resumes
+    while not device.operations.pending:
+        await asyncio.sleep(0)
+    write = asyncio.ensure_future(device.write_gatt(UUID_1, "ff"))
+    assert await read == b"\x01\x02"
+    await write
+    assert await device.read_gatt(UUID_1) == b"\xff"
+    await device.stop()
+
+
+async def test_concurrent_reads_share_one_read(bleak) -> None:
+    bleak.latency = 0.01
+    device = _device(0)
+    values = await asyncio.gather(*(device.read_gatt(UUID_1) for _ in range(5)))
+    assert values == [b"\x01\x02"] * 5
+    assert bleak.client.reads == 1
+    assert device.read_cache.as_dict()["collapsed"] == 4
+    await device.stop()
+
+
+async def test_cancelled_first_reader_does_not_fail_the_others(bleak) -> None:
+    bleak.latency = 0.01
+    device = _device(0)
+    first = asyncio.ensure_future(device.read_gatt(UUID_1))
+    await asyncio.sleep(0)
+    others = [asyncio.ensure_future(device.read_gatt(UUID_1)) for _ in range(3)]
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await asyncio.gather(*others) == [b"\x01\x02"] * 3
+    assert first.cancelled()
+    assert bleak.client.reads == 1
+    await device.stop()
+
+
+async def test_failed_read_fails_every_reader() -> None:
+    cache = ReadCache({UUID_1: 60})
+    started = asyncio.Event()
+
+    async def _read() -> bytes:
+        started.set()
+        await asyncio.sleep(0)
+        raise OSError("failed")
+
+    results = await asyncio.gather(cache.async_read(UUID_1, _read), cache.async_read(UUID_1, _read), return_exceptions=True)
+    assert [type(result) for result in results] == [OSError, OSError]
+    assert cache.values() == {}
@@ -0,0 +1,131 @@
+"""Tests for the GATT operation queue."""
+import asyncio
+
+import pytest
+
+from custom_components.generic_bt.generic_bt_api.const import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from custom_components.generic_bt.generic_bt_api.exceptions import GenericBTError, GenericBTQueueFull
+from custom_components.generic_bt.generic_bt_api.scheduler import OperationQueue
+
+
+class _Recorder:
+    """Operations that record the order they ran in, the first one waits for release()."""
+
+    def __init__(self) -> None:
+        self.ran: list[str] = []
+        self.gate = asyncio.Event()
+
+    def operation(self, name: str, wait: bool = False):
+        async def _run() -> str:
+            if wait:
+                await self.gate.wait()
+            self.ran.append(name)
+            return name
+
+        return _run
+
+
+async def test_interactive_operations_run_before_background_ones() -> None:
+    queue = OperationQueue()
+    recorder = _Recorder()
+    running = asyncio.ensure_future(queue.async_submit(recorder.operation("running", True)))
+    await asyncio.sleep(0)
+    background = asyncio.ensure_future(queue.async_submit(recorder.operation("background"), PRIORITY_BACKGROUND))
+    interactive = asyncio.ensure_future(queue.async_submit(recorder.operation("interactive"), PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    recorder.gate.set()
+
+    assert await asyncio.gather(running, background, interactive) == ["running", "background", "interactive"]
+    assert recorder.ran == ["running", "interactive", "background"]
+    assert queue.completed == 3
+
+
+async def test_coalesced_operations_run_the_latest_once() -> None:
+    queue = OperationQueue()
+    recorder = _Recorder()
+    running = asyncio.ensure_future(queue.async_submit(recorder.operation("running", True)))
+    await asyncio.sleep(0)
+    writes = [asyncio.ensure_future(queue.async_submit(recorder.operation(f"write {index}"), coalesce_key="uuid")) for index in range(5)]
+    await asyncio.sleep(0)
+    recorder.gate.set()
+
+    # every caller gets the result of the write that was sent
+    assert await asyncio.gather(*writes) == ["write 4"] * 5
+    await running
+    assert recorder.ran == ["running", "write 4"]
+    assert queue.coalesced == 4
+
+
+async def test_full_queue_drops_background_operations_for_interactive_ones() -> None:
+    queue = OperationQueue(max_pending=2)
+    recorder = _Recorder()
+    running = asyncio.ensure_future(queue.async_submit(recorder.operation("running", True)))
+    await asyncio.sleep(0)
+    polls = [asyncio.ensure_future(queue.async_submit(recorder.operation(f"poll {index}"), PRIORITY_BACKGROUND)) for index in range(2)]
+    await asyncio.sleep(0)
+
+    # the queue is full of background operations, the newest one makes room
+    write = asyncio.ensure_future(queue.async_submit(recorder.operation("write")))
+    await asyncio.sleep(0)
+    with pytest.raises(GenericBTQueueFull):
+        await polls[1]
+    # nothing of a lower priority is left to drop
+    with pytest.raises(GenericBTQueueFull):
+        await queue.async_submit(recorder.operation("rejected"), PRIORITY_BACKGROUND)
+
+    recorder.gate.set()
+    assert await write == "write"
+    assert await polls[0] == "poll 0"
+    await running
+    assert recorder.ran == ["running", "write", "poll 0"]
+    assert queue.rejected == 2
+
+
+async def test_failed_operation_does_not_stop_the_queue() -> None:
+    queue = OperationQueue()
+
+    async def _fail() -> None:
+        raise GenericBTError("failed")
+
+    async def _succeed() -> str:
+        return "done"
+
+    results = await asyncio.gather(queue.async_submit(_fail), queue.async_submit(_succeed), return_exceptions=True)
+    assert isinstance(results[0], GenericBTError)
+    assert results[1] == "done"
+
+
+async def test_stop_fails_queued_operations() -> None:
+    queue = OperationQueue()
+    recorder = _Recorder()
+    running = asyncio.ensure_future(queue.async_submit(recorder.operation("running", True)))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(queue.async_submit(recorder.operation("queued")))
+    await asyncio.sleep(0)
+
+    stopping = asyncio.ensure_future(queue.async_stop())
+    await asyncio.sleep(0)
+    recorder.gate.set()
+    await stopping
+
+    assert await running == "running"
+    with pytest.raises(GenericBTError, match="Device stopped"):
+        await queued
+    assert recorder.ran == ["running"]
+    assert queue.pending == 0
+
+
+async def test_wait_time_is_measured_from_queueing() -> None:
+    queue = OperationQueue()
+    recorder = _Recorder()
+    running = asyncio.ensure_future(queue.async_submit(recorder.operation("running", True)))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(queue.async_submit(recorder.operation("queued")))
+    await asyncio.sleep(0.05)
+    recorder.gate.set()
+    await asyncio.gather(running, queued)
+
+    assert queue.wait_time.count == 2
+    # the first one started right away, the second one waited for it
+    assert queue.wait_time.max >= 0.05
+    assert queue.wait_time.total - queue.wait_time.max < 0.01
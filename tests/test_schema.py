@@ -0,0 +1,82 @@
+"""Tests for the payload schemas."""
+import pytest
+
+from custom_components.generic_bt.generic_bt_api.schema import PayloadSchema, parse_schema
+
+from .common import async_setup_entry, make_service_info, size_payload
+
+SERVICE_UUID = "0000181a-0000-1000-8000-00805f9b34fb"
+
+
+def test_parse_schema() -> None:
+    fields = parse_schema(
+        """
+        # comments and blank lines are skipped
+
+        65535, size, 17, H, 0.01, cm
+        0xFFFF, flags, 0x0F, >B
+        0000181A-0000-1000-8000-00805F9B34FB, temperature, 0, h, 0.1
+        """
+    )
+    assert [(field.source, field.name, field.offset, field.value_format, field.scale, field.unit) for field in fields] == [
+        (65535, "size", 17, "<H", 0.01, "cm"),
+        (65535, "flags", 15, ">B", 1.0, None),
+        (SERVICE_UUID, "temperature", 0, "<h", 0.1, None),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("text", "error"),
+    [
+        ("65535, size, 17", "line 1: expected"),
+        ("65535, size, 17, H\n65535, size, 19, B", "line 2: field names"),
+        ("65535, size, -1, H", "line 1: offset"),
+        ("65535, size, 17, s", "line 1: unsupported type"),
+        ("65535, size, x, H", "line 1: "),
+    ],
+)
+def test_parse_schema_errors(text: str, error: str) -> None:
+    with pytest.raises(ValueError, match=error):
+        parse_schema(text)
+
+
+def test_empty_schema() -> None:
+    assert PayloadSchema.from_text("# nothing\n") is None
+
+
+def test_decode() -> None:
+    schema = PayloadSchema.from_text(f"65535, size, 17, H, 0.01\n65535, marker, 15, B\n{SERVICE_UUID}, temperature, 0, h, 0.1")
+    assert schema is not None
+    assert schema.service_uuids == (SERVICE_UUID,)
+    assert schema.decode(65535, size_payload(250)) == {"marker": 0x25, "size": 2.5}
+    assert schema.decode(SERVICE_UUID, (-123).to_bytes(2, "little", signed=True)) == {"temperature": pytest.approx(-12.3)}
+    assert schema.decode(1, b"\x00") == {}
+
+
+def test_decode_short_and_overlapping() -> None:
+    schema = PayloadSchema.from_text("1, word, 0, H\n1, low, 0, B\n1, far, 4, B")
+    assert schema is not None
+    assert schema.decode(1, b"\x01\x02\x03\x04\x05") == {"word": 0x0201, "low": 1, "far": 5}
+    # only the fields that fit a short payload
+    assert schema.decode(1, b"\x01\x02") == {"word": 0x0201, "low": 1}
+
+
+async def test_field_sensors(hass, bluetooth) -> None:
+    bluetooth.advertise(make_service_info(size_payload(10000), service_data={SERVICE_UUID: b"\xd2\x00"}))
+    await async_setup_entry(hass, {"payload_schema": f"65535, size, 17, H, 0.01, cm\n65535, tail, 19, B\n65535, marker, 15, ?\n{SERVICE_UUID}, temperature, 0, h, 0.1"})
+
+    assert hass.states.get("sensor.tag_size").state == "100.0"
+    assert hass.states.get("sensor.tag_size").attributes["unit_of_measurement"] == "cm"
+    assert hass.states.get("sensor.tag_temperature").state == "21.0"
+    assert hass.states.get("sensor.tag_size").attributes["state_class"] == "measurement"
+    # booleans have no statistics
+    assert hass.states.get("sensor.tag_marker").state == "True"
+    assert "state_class" not in hass.states.get("sensor.tag_marker").attributes
+    size_updated = hass.states.get("sensor.tag_size").last_updated
+
+    bluetooth.advertise(make_service_info(size_payload(10000)[:19] + b"\x07" + bytes(2), service_data={SERVICE_UUID: b"\xd2\x00"}))
+    await hass.async_block_till_done()
+
+    assert hass.states.get("sensor.tag_tail").state == "7"
+    # fields whose value did not change are not written again
+    assert hass.states.get("sensor.tag_size").last_updated == size_updated
@@ -0,0 +1,40 @@
+"""Tests for the decoded device snapshots."""
+import pytest
+
+from custom_components.generic_bt.generic_bt_api.device import GenericBTDevice
+from custom_components.generic_bt.generic_bt_api.snapshot import DeviceSnapshot
+
+from .common import ADDRESS, size_payload
+
+
+def test_snapshot_is_immutable() -> None:
+    snapshot = DeviceSnapshot(65535, {"size": 1.0}, 1.0, {"size": 1.0})
+
+    with pytest.raises(AttributeError):
+        snapshot.value = 2.0
+    with pytest.raises(AttributeError):
+        del snapshot.value
+    # slots only, nothing can be added
+    with pytest.raises(AttributeError):
+        snapshot.extra = True
+    assert not hasattr(snapshot, "__dict__")
+    for mapping in (snapshot.data, snapshot.attributes, snapshot.value_attributes):
+        with pytest.raises(TypeError):
+            mapping["size"] = 2.0
+    assert snapshot.attributes == {"size": 1.0, "manufacturer_id": 65535}
+    assert snapshot.data == {"size": 1.0}
+
+
+def test_new_payload_replaces_the_snapshot() -> None:
+    device = GenericBTDevice(None, ADDRESS)
+    device.update_from_payload(65535, size_payload(100))
+    first = device.snapshot
+    attributes = first.attributes
+
+    # an unchanged payload keeps the snapshot, a changed one replaces it and leaves the old one as it was
+    assert not device.update_from_payload(65535, size_payload(100))
+    assert device.snapshot is first
+    assert device.update_from_payload(65535, size_payload(250))
+    assert device.snapshot is not first
+    assert (first.value, device.snapshot.value) == (1.0, 2.5)
+    assert first.attributes is attributes and attributes["size"] == 1.0